@@ -171,7 +171,7 @@ conversation_history = collections.deque(maxlen=50) # Store last 50 messages (us
 # Tracks position removal usage per conversation to prevent duplicate execution
 # position_removal_used = False  # Reset when conversation context changes or clears
 # --- Use standard thread-safe queues ---
-trigger_queue: ThreadSafeQueue = ThreadSafeQueue() # UI Thread -> Main Loop
+trigger_queue: ThreadSafeQueue = ThreadSafeQueue(maxsize=8) # UI Thread -> Main Loop (bounded; UI thread drops oldest when full)
 command_queue: ThreadSafeQueue = ThreadSafeQueue() # Main Loop -> UI Thread
 # MCP position tool result queue
 position_result_queue: ThreadSafeQueue = ThreadSafeQueue() # UI Thread -> MCP Tool
@@ -1039,7 +1039,7 @@ async def run_main_with_exit_stack():
         def periodic_robust_cleanup_and_stats():
             if not shutdown_requested: # Only run if not shutting down
                 print("Main Thread: Running periodic robust deduplicator cleanup and stats logging...")
-                deduplicator._save_to_storage(force=True) # Force save current state
+                deduplicator.request_save() # Persisted by the deduplicator's flusher thread
                 stats = deduplicator.get_stats()
                 print(f"Main Thread - Dedup Stats: {stats['active_records']} active records (total: {stats['total_records']})")
                 # Reschedule the timer
@@ -1290,7 +1290,7 @@ async def run_main_with_exit_stack():
                                 print(f"  search_area available: {'Yes' if search_area is not None else 'No'}")
 
                                 # Check if we have snapshot and search_area as well
-                                if bubble_snapshot and search_area:
+                                if bubble_snapshot is not None and search_area:
                                     print("Sending 'remove_position' command to UI thread with snapshot and search area...")
                                     command_to_send = {
                                         'action': 'remove_position',
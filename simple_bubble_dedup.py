@@ -74,9 +74,11 @@ class SimpleBubbleDeduplication:
             # If it's bytes or BytesIO
             elif isinstance(bubble_snapshot, (bytes, io.BytesIO)):
                 img = Image.open(io.BytesIO(bubble_snapshot) if isinstance(bubble_snapshot, bytes) else bubble_snapshot)
-            # If it's a numpy array
+            # If it's a numpy array (OpenCV/mss captures are BGR, PIL expects RGB)
             elif isinstance(bubble_snapshot, np.ndarray):
-                img = Image.fromarray(bubble_snapshot)
+                if bubble_snapshot.ndim == 3:
+                    bubble_snapshot = bubble_snapshot[:, :, ::-1]
+                img = Image.fromarray(np.ascontiguousarray(bubble_snapshot))
             else:
                 print(f"Unrecognized image format: {type(bubble_snapshot)}")
                 return None
@@ -20,12 +20,51 @@ import threading # Import threading for Lock if needed, or just use a simple fla
 import math # Added for distance calculation in dual method
 import datetime # Added for MCP result timestamps
 import hashlib # Added for UI stability checking
+import zlib # Added for fast screen fingerprints
+import atexit # Added for flushing pending dedup records on exit
+from concurrent.futures import ThreadPoolExecutor # Added for parallel corner template search
 import time # Ensure time is imported for MessageDeduplication
 from simple_bubble_dedup import SimpleBubbleDeduplication
 import difflib # Added for text similarity
+import re # Added for whitespace normalization in deduplication
+import unicodedata # Added for clipboard text normalization
 import os # Already imported, but good to note for RobustMessageDeduplication
 import json # Already imported, but good to note for RobustMessageDeduplication
 
+try:
+    import mss # Fast screen capture (reuses the GDI/X11 handle between grabs)
+    HAS_MSS = True
+except ImportError:
+    HAS_MSS = False
+    print("Warning: mss module not installed, falling back to pyautogui.screenshot for screen capture")
+
+try:
+    import orjson # Fast JSON serialization for dedup persistence
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    from rapidfuzz import fuzz # Fast string similarity for deduplication (falls back to difflib)
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+# Fastest available connected-component labelling for 8-connectivity (Spaghetti needs OpenCV >= 4.5)
+CCL_ALGORITHM = getattr(cv2, 'CCL_SPAGHETTI', cv2.CCL_BBDT)
+
+try:
+    # Only CUDA builds of OpenCV report devices; the stock pip wheels have no usable cv2.cuda
+    HAS_CUDA = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    HAS_CUDA = False
+
+# 空白正規化（單次 C 層掃描，取代 ' '.join(s.split())）
+_WS_RE = re.compile(r'\s+')
+
+# 去重記錄（namedtuple 無實例 __dict__，記憶體與普通 tuple 相同）
+DedupEntry = collections.namedtuple('DedupEntry', ['sender', 'content', 'timestamp'])
+
 # 替換現有的 MessageDeduplication 類
 class RobustMessageDeduplication:
     def __init__(self, storage_file="wolf_chat_dedup.json", max_messages=None):
@@ -35,12 +74,20 @@ class RobustMessageDeduplication:
             max_messages = getattr(config, 'DEDUPLICATION_WINDOW_SIZE', 4)
         self.max_messages = max_messages  # 最大記錄數量（滾動視窗）
         self.processed_messages = collections.OrderedDict()  # 使用OrderedDict保持順序
-        self.last_save_time = 0
-        self.save_interval = 10  # 每10秒保存一次
+        self._sender_index = {}  # clean_sender -> {message_key: clean_content}（按插入順序），相似性檢查只掃描同一發送者的桶
+        self.save_interval = 10  # 背景寫入延遲：變更後等待10秒再合併寫入
+        self._lock = threading.RLock()  # 保護 processed_messages / _sender_index
+        self._write_lock = threading.Lock()  # 串行化整個保存流程（序列化、寫 .tmp、os.replace），取得順序固定為 _write_lock → _lock
+        self._dirty = threading.Event()  # 有未保存的變更
         
         # 啟動時加載持久化數據
         self._load_from_storage()
         
+        # 背景寫入執行緒：合併 save_interval 內的所有變更為一次寫入
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="dedup_flusher", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self._flush_pending)
+        
         print(f"RobustDeduplication initialized with {len(self.processed_messages)} existing records")
     
     def _load_from_storage(self):
@@ -53,120 +100,242 @@ class RobustMessageDeduplication:
                     
                     # 轉換為OrderedDict並限制數量
                     self.processed_messages = collections.OrderedDict()
+                    self._sender_index = {}
                     loaded_count = 0
                     # 加載最近的記錄（假設JSON中的順序就是時間順序）
-                    for key, timestamp in messages_data.items():
+                    for key, value in messages_data.items():
                         if loaded_count >= self.max_messages:
                             break
-                        self.processed_messages[key] = timestamp
+                        if isinstance(value, (int, float)):
+                            # 舊格式: "sender:content" -> timestamp
+                            stored_sender, _, stored_content = key.partition(":")
+                            clean_sender, clean_content = self._normalize(stored_sender, stored_content)
+                            self._add_entry(self._create_message_key(clean_sender, clean_content), DedupEntry(clean_sender, clean_content, int(value)))
+                        else:
+                            clean_sender, clean_content, timestamp = value
+                            self._add_entry(key, DedupEntry(clean_sender, clean_content, int(timestamp)))
                         loaded_count += 1
                     
                     print(f"Loaded {len(self.processed_messages)} dedup records from storage")
         except Exception as e:
             print(f"Warning: Could not load dedup storage: {e}")
             self.processed_messages = collections.OrderedDict()
+            self._sender_index = {}
     
-    def _save_to_storage(self, force=False):
-        """保存去重記錄到持久化文件"""
-        current_time = time.time()
-        if not force and (current_time - self.last_save_time) < self.save_interval:
-            return
+    def _flush_loop(self):
+        """背景執行緒：等待變更，延遲 save_interval 秒後一次寫入"""
+        while True:
+            self._dirty.wait()
+            time.sleep(self.save_interval)
+            self._dirty.clear()
+            self._save_to_storage()
+
+    def request_save(self):
+        """請求保存：標記待保存，由背景執行緒 _flush_loop 合併寫入"""
+        self._dirty.set()
+
+    def _flush_pending(self):
+        """程式結束時寫入尚未保存的變更"""
+        if self._dirty.is_set():
+            self._dirty.clear()
+            self._save_to_storage()
+
+    def _save_to_storage(self):
+        """保存去重記錄到持久化文件（寫入排程由背景執行緒 _flush_loop 負責）"""
+        current_time = int(time.time())
         
         try:
-            # 將OrderedDict轉換為普通dict以供JSON保存
-            messages_dict = dict(self.processed_messages)
-            
-            data = {
-                'messages': messages_dict,
-                'last_updated': current_time
-            }
-            
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            # 寫入鎖涵蓋「序列化 + 寫 .tmp + 替換」整個流程：背景執行緒、atexit 與 clear_all 的保存
+            # 不會交錯寫入同一個 .tmp，較舊的快照也不會在較新的快照之後覆蓋主文件
+            with self._write_lock:
+                # 直接序列化 OrderedDict（DedupEntry 輸出為 [sender, content, timestamp]），不另建副本；
+                # 持資料鎖期間只做序列化，寫檔在資料鎖外進行
+                with self._lock:
+                    record_count = len(self.processed_messages)
+                    data = {
+                        'messages': self.processed_messages,
+                        'last_updated': current_time
+                    }
+                    if HAS_ORJSON:
+                        data_bytes = orjson.dumps(data, default=list)  # orjson 不直接支援 namedtuple
+                    else:
+                        data_bytes = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                
+                # 先寫入臨時文件再原子替換，避免中途崩潰留下不完整的 JSON
+                tmp_file = self.storage_file + ".tmp"
+                with open(tmp_file, 'wb') as f:
+                    f.write(data_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.storage_file)
             
-            self.last_save_time = current_time
-            print(f"Saved {len(messages_dict)} dedup records to storage")
+            print(f"Saved {record_count} dedup records to storage")
             
         except Exception as e:
             print(f"Error saving dedup storage: {e}")
     
     
-    def _create_message_key(self, sender, content):
-        """創建標準化的消息鍵"""
-        # 標準化處理
-        clean_sender = sender.lower().strip() if sender else ""
-        clean_content = ' '.join(content.strip().split()) if content else ""
-        return f"{clean_sender}:{clean_content}"
+    def _normalize(self, sender, content):
+        """標準化發送者與內容，返回 (clean_sender, clean_content)"""
+        clean_sender = sys.intern(sender.lower().strip()) if sender else ""  # 同一發送者的所有記錄共用一個字串
+        if not content:
+            clean_content = ""
+        elif content.isprintable() and '  ' not in content and content[0] != ' ' and content[-1] != ' ':
+            # 快速路徑：isprintable() 排除了除 ASCII 空格外的所有空白字元，內容已是標準形式
+            clean_content = content
+        else:
+            clean_content = _WS_RE.sub(' ', content).strip()
+        return clean_sender, clean_content
+
+    def _create_message_key(self, clean_sender, clean_content):
+        """創建固定長度的消息鍵（標準化後內容的 BLAKE2b 摘要）"""
+        return hashlib.blake2b(f"{clean_sender}:{clean_content}".encode('utf-8'), digest_size=16).hexdigest()
     
+    def _add_entry(self, message_key, entry):
+        """加入（或移到最新位置）一筆記錄並同步發送者索引"""
+        self._remove_entry(message_key)
+        self.processed_messages[message_key] = entry
+        self._sender_index.setdefault(entry.sender, {})[message_key] = entry.content
+
+    def _remove_entry(self, message_key):
+        """移除一筆記錄並同步發送者索引"""
+        entry = self.processed_messages.pop(message_key, None)
+        if entry is None:
+            return
+        bucket = self._sender_index.get(entry.sender)
+        if bucket is not None:
+            bucket.pop(message_key, None)
+            if not bucket:
+                del self._sender_index[entry.sender]
+
+    def _trim_window(self):
+        """維持滾動視窗大小（移除最舊的記錄）"""
+        while len(self.processed_messages) > self.max_messages:
+            self._remove_entry(next(iter(self.processed_messages)))
+
     def is_duplicate(self, sender, content):
         """滾動視窗的重複檢查（無過期機制）"""
-        if not sender or not content:
-            print("Deduplication: Missing sender or content, treating as new")
-            return False
+        with self._lock:  # 與背景寫入執行緒共享 processed_messages
+            if not sender or not content:
+                print("Deduplication: Missing sender or content, treating as new")
+                return False
         
-        current_time = time.time()
+            current_time = int(time.time())  # 整數秒即可（僅供統計），持久化更精簡
         
-        # 創建消息鍵
-        message_key = self._create_message_key(sender, content)
+            # 創建消息鍵
+            clean_sender, clean_content = self._normalize(sender, content)
+            message_key = self._create_message_key(clean_sender, clean_content)
+            new_entry = DedupEntry(clean_sender, clean_content, current_time)
         
-        # 精確匹配檢查
-        if message_key in self.processed_messages:
-            print(f"DUPLICATE EXACT: {sender} - {content[:40]}...")
-            # 更新時間戳（移動到最新位置）
-            del self.processed_messages[message_key]
-            self.processed_messages[message_key] = current_time
-            return True
+            # 精確匹配檢查
+            if message_key in self.processed_messages:
+                print(f"DUPLICATE EXACT: {sender} - {content[:40]}...")
+                # 更新時間戳（移動到最新位置）
+                self._add_entry(message_key, new_entry)
+                return True
         
-        # 相似性檢查
-        clean_content = ' '.join(content.strip().split())
-        for existing_key, timestamp in list(self.processed_messages.items()):
-            try:
-                stored_sender, stored_content = existing_key.split(":", 1)
-                if sender.lower().strip() == stored_sender:
-                    # 計算相似度
-                    similarity = difflib.SequenceMatcher(None, clean_content, stored_content).ratio()
-                    if similarity >= 0.98:  # 98%相似度
-                        print(f"DUPLICATE SIMILAR: {sender} - {content[:40]}... (similarity: {similarity:.3f})")
-                        # 更新為新的消息（覆蓋相似的舊消息）
-                        del self.processed_messages[existing_key]
-                        self.processed_messages[message_key] = current_time
-                        # 維持滾動視窗大小
-                        while len(self.processed_messages) > self.max_messages:
-                            self.processed_messages.popitem(last=False)  # 移除最舊的
-                        self._save_to_storage()
-                        return True
-            except ValueError:
-                continue
+            # 相似性檢查（僅比對同一發送者的記錄；該發送者無記錄時直接視為新消息）
+            similarity_threshold = 0.98  # 98%相似度
+            content_len = len(clean_content)
+            bucket = self._sender_index.get(clean_sender)
+            for existing_key, stored_content in (list(bucket.items()) if bucket else ()):
+                # 長度上界（等同 real_quick_ratio）：長度差太大時不可能達到門檻，免建 SequenceMatcher
+                stored_len = len(stored_content)
+                if 2.0 * min(content_len, stored_len) / (content_len + stored_len) < similarity_threshold:
+                    continue
+                # 計算相似度
+                if HAS_RAPIDFUZZ:
+                    # C++ 實作的 Indel 相似度；未達 score_cutoff 時直接返回 0
+                    similarity = fuzz.ratio(clean_content, stored_content, score_cutoff=similarity_threshold * 100) / 100.0
+                else:
+                    matcher = difflib.SequenceMatcher(None, clean_content, stored_content)
+                    # quick_ratio 是 ratio 的上界（字元多重集合交集），先排除再做完整比對
+                    if matcher.quick_ratio() < similarity_threshold:
+                        continue
+                    similarity = matcher.ratio()
+                if similarity >= similarity_threshold:
+                    print(f"DUPLICATE SIMILAR: {sender} - {content[:40]}... (similarity: {similarity:.3f})")
+                    # 更新為新的消息（覆蓋相似的舊消息）
+                    self._remove_entry(existing_key)
+                    self._add_entry(message_key, new_entry)
+                    self._trim_window()
+                    self._dirty.set()  # 交由背景執行緒寫入
+                    return True
         
-        # 記錄新消息
-        self.processed_messages[message_key] = current_time
-        print(f"NEW MESSAGE RECORDED: {sender} - {content[:40]}...")
+            # 記錄新消息
+            self._add_entry(message_key, new_entry)
+            print(f"NEW MESSAGE RECORDED: {sender} - {content[:40]}...")
         
-        # 維持滾動視窗大小
-        while len(self.processed_messages) > self.max_messages:
-            self.processed_messages.popitem(last=False)  # 移除最舊的
+            # 維持滾動視窗大小
+            self._trim_window()
         
-        # 保存到文件
-        self._save_to_storage()
+            # 標記待保存（由背景執行緒合併寫入，不阻塞偵測迴圈）
+            self._dirty.set()
         
-        return False
+            return False
     
     def clear_all(self):
         """清空所有記錄"""
-        self.processed_messages.clear()
-        self._save_to_storage(force=True)
+        with self._lock:
+            self.processed_messages.clear()
+            self._sender_index.clear()
+        self._dirty.clear()
+        self._save_to_storage()
         print("All dedup records cleared and persisted")
     
     def get_stats(self):
         """獲取統計信息"""
-        current_time = time.time()
+        current_time = int(time.time())
         
-        return {
-            'total_records': len(self.processed_messages),
-            'active_records': len(self.processed_messages),  # 滾動視窗中的都是活躍記錄
-            'oldest_record_age': min([current_time - t for t in self.processed_messages.values()]) if self.processed_messages else 0,
-            'max_messages': self.max_messages
-        }
+        with self._lock:
+            return {
+                'total_records': len(self.processed_messages),
+                'active_records': len(self.processed_messages),  # 滾動視窗中的都是活躍記錄
+                'oldest_record_age': min([current_time - t for _, _, t in self.processed_messages.values()]) if self.processed_messages else 0,
+                'max_messages': self.max_messages
+            }
+
+# --- Background Log Writer ---
+# (log_file, line) pairs are appended by a daemon thread in ~1 s batches so diagnostics never block the UI loop
+_log_queue = queue.SimpleQueue()
+_log_pending = threading.Event()
+_log_drain_lock = threading.Lock()
+_log_writer_thread = None
+
+def _drain_log_queue():
+    """Write every queued line, one open/append per log file."""
+    with _log_drain_lock:
+        batches = {}
+        while True:
+            try:
+                log_file, line = _log_queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(log_file, []).append(line)
+        for log_file, lines in batches.items():
+            try:
+                with open(log_file, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            except Exception:
+                pass
+
+def _log_writer_loop():
+    while True:
+        _log_pending.wait()
+        time.sleep(1.0) # Coalesce lines arriving within a second
+        _log_pending.clear()
+        _drain_log_queue()
+
+def append_log_line(log_file: str, line: str):
+    """Queue a line for asynchronous append to log_file."""
+    global _log_writer_thread
+    _log_queue.put((log_file, line))
+    _log_pending.set()
+    if _log_writer_thread is None:
+        _log_writer_thread = threading.Thread(target=_log_writer_loop, name="log_writer", daemon=True)
+        _log_writer_thread.start()
+
+atexit.register(_drain_log_queue)
 
 # 診斷工具：狀態重置檢測器
 class StateResetDetector:
@@ -174,6 +343,7 @@ class StateResetDetector:
         self.log_file = log_file
         self.start_time = time.time()
         self.reset_count = 0
+        self._last_ids = {}  # obj_name -> 上次檢查時的 id(obj)
         
     def log_reset(self, reset_type, context=""):
         """記錄狀態重置事件"""
@@ -182,25 +352,20 @@ class StateResetDetector:
         
         log_entry = f"{timestamp:.3f}: RESET #{self.reset_count} - {reset_type} - {context}\n"
         
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-        except:
-            pass
+        # 交由背景執行緒批次寫入
+        append_log_line(self.log_file, log_entry)
         
         print(f"STATE RESET DETECTED: {reset_type} - {context}")
     
     def check_object_identity(self, obj, obj_name):
         """檢查對象是否被重新創建"""
         obj_id = id(obj)
-        attr_name = f"_{obj_name}_last_id"
+        last_id = self._last_ids.get(obj_name)
         
-        if hasattr(self, attr_name):
-            last_id = getattr(self, attr_name)
-            if last_id != obj_id:
-                self.log_reset("OBJECT_RECREATED", f"{obj_name} object was recreated")
+        if last_id is not None and last_id != obj_id:
+            self.log_reset("OBJECT_RECREATED", f"{obj_name} object was recreated")
         
-        setattr(self, attr_name, obj_id)
+        self._last_ids[obj_name] = obj_id
 
 # --- Global Pause Flag ---
 # Using a simple mutable object (list) for thread-safe-like access without explicit lock
@@ -209,23 +374,8 @@ monitoring_paused_flag = [False] # List containing a boolean
 
 # --- Global Error Handling Setup for Text Encoding ---
 def handle_text_encoding(text, default_text="[無法處理的文字]"):
-    """安全處理任何文字，確保不會因編碼問題而崩潰程序"""
-    if text is None:
-        return default_text
-    
-    try:
-        # 嘗試使用 utf-8 編碼
-        return text
-    except UnicodeEncodeError:
-        try:
-            # 嘗試將特殊字符替換為可顯示字符
-            return text.encode('utf-8', errors='replace').decode('utf-8')
-        except:
-            # 最後手段：忽略任何無法處理的字符
-            try:
-                return text.encode('utf-8', errors='ignore').decode('utf-8')
-            except:
-                return default_text
+    """以預設文字取代 None（實際的編碼清理在寫入剪貼簿時進行，見 InteractionModule.set_clipboard）"""
+    return default_text if text is None else text
 
 # --- Color Config Loading ---
 def load_bubble_colors(config_path='bubble_colors.json'):
@@ -428,6 +578,12 @@ BUBBLE_RELOCATE_FALLBACK_CONFIDENCE = 0.6  # 備用低信心度
 DUAL_METHOD_CONFIDENCE_THRESHOLD = 0.87  # 雙方法個別閾值
 DUAL_METHOD_HIGH_CONFIDENCE_THRESHOLD = 0.85  # 高信心度直接接受
 DUAL_METHOD_FALLBACK_CONFIDENCE_THRESHOLD = 0.8  # 備用閾值
+KEYWORD_EARLY_EXIT_CONFIDENCE = 0.95  # 單一模板達到此信心度即停止嘗試其餘模板
+
+# 關鍵字金字塔匹配（先半解析度粗搜尋，再於峰值附近全解析度精修）
+KEYWORD_PYRAMID_COARSE_CONFIDENCE = 0.6  # 粗搜尋門檻，低於此值視為無關鍵字
+KEYWORD_PYRAMID_REFINE_PAD = 4  # 精修視窗在粗略位置周圍的額外像素
+KEYWORD_PYRAMID_MIN_TEMPLATE_SIDE = 16  # 模板短邊小於此值時直接全解析度匹配
 
 # UI 元素偵測信心度（用於各種 UI 按鈕和選項）
 UI_ELEMENT_HIGH_CONFIDENCE = 0.8  # 高優先級 UI 元素（chat_option, capitol_button 等）
@@ -463,6 +619,7 @@ DELAY_CAPITOL_PAGE = 0.2  # 等待國會頁面載入
 DELAY_POSITION_PAGE = 0.4  # 等待職位頁面載入
 DELAY_CONFIRMATION = 0.4  # 等待確認對話框
 DELAY_ACTION_COMPLETE = 0.05  # 等待動作完成
+ADAPTIVE_WAIT_TICK = 0.01  # 輪詢等待 UI/剪貼簿反應的間隔（取代固定 sleep，條件成立即返回）
 
 # 循環與重試延遲
 DELAY_BUBBLE_SCAN_INTERVAL = 1.5  # 泡泡掃描間隔
@@ -470,6 +627,11 @@ DELAY_ERROR_RETRY = 0.5  # 錯誤後重試延遲
 DELAY_MAJOR_ERROR_RETRY = 3  # 重大錯誤後重試延遲
 DELAY_GAME_RESTART_WAIT = 30  # 遊戲重啟後等待時間
 
+# 截圖快取
+FRAME_CACHE_MAX_AGE = 0.05  # 泡泡區域截圖可供關鍵字偵測重用的最長時間（秒）
+UI_STATE_CACHE_TTL = 0.15  # get_current_ui_state 結果的重用時間（秒），任何點擊/按鍵後失效
+INPUT_BOX_CACHE_TTL = 30.0  # 以模板找到的輸入框座標重用時間（秒），輸入框位置固定
+
 # ============================================================
 # 第五組：容差與閾值配置
 # ============================================================
@@ -491,6 +653,17 @@ RECENT_TEXT_HISTORY_MAXLEN = 5  # 近期文字歷史最大長度
 CLAHE_CLIP_LIMIT = 2.0  # CLAHE 對比度限制
 CLAHE_TILE_SIZE = (8, 8)  # CLAHE 網格大小
 
+# 需保留彩色匹配的模板（其餘模板一律以灰階匹配，減少 3 倍像素運算）
+# 聊天分頁標籤的選中/未選中狀態主要以顏色區分；
+# 泡泡角落模板中，機器人（淺藍）與一般使用者（近白）泡泡的外形相同、主要差在色調，
+# 灰階下會互相誤配而把機器人泡泡誤判為一般泡泡，因此一律以彩色匹配（與原本行為一致）
+COLOR_SENSITIVE_TEMPLATE_KEYS = {
+    'world_chat', 'private_chat',
+    'corner_tl', 'corner_br', 'corner_tl_type2', 'corner_br_type2',
+    'corner_tl_type3', 'corner_br_type3', 'corner_tl_type4', 'corner_br_type4',
+    'bot_corner_tl', 'bot_corner_br',
+}
+
 # ============================================================
 # 第七組：經濟模式與穩定性配置
 # ============================================================
@@ -499,10 +672,15 @@ ECO_MODE_THRESHOLD = 2  # 觸發經濟模式的無新泡泡循環次數
 ECO_MODE_INTERVAL = 1.5  # 經濟模式的檢測間隔（秒）
 ECO_MODE_WAKEUP_INTERVAL = 300  # 5 分鐘強制喚醒間隔（秒）
 ECO_MODE_CHANGE_THRESHOLD = 2.0  # 2% 的像素變化閾值
+ECO_MODE_DOWNSAMPLE = 4  # 比較前每軸縮小倍數（INTER_AREA，4 = 1/16 像素）
+ECO_MODE_NOISE_THRESHOLD = 5  # 灰階差異大於此值才算變化像素（忽略畫面雜訊閃爍）
 
 # UI 穩定性參數
 UI_STABILITY_TIMEOUT = 0.5  # UI 穩定性最大等待時間
 UI_STABILITY_DURATION = 0.1  # 需要的穩定持續時間
+UI_STABILITY_DOWNSAMPLE = 4  # 穩定性比較前每軸取樣間隔（4 = 1/16 像素）
+UI_STABILITY_PIXEL_TOLERANCE = 3  # 灰階差異大於此值才算變化像素（忽略雜訊）
+UI_STABILITY_CHANGE_THRESHOLD = 0.02  # 變化像素比例低於此值視為穩定
 VERIFICATION_ATTEMPTS = 3  # 驗證嘗試次數
 
 # ============================================================
@@ -517,12 +695,80 @@ MAIN_SCREEN_RETURN_Y = 1300  # 返回聊天室的 Y 座標
 # 參數配置區結束
 # ==============================================================================
 
+# --- Screen Capture Helpers ---
+# Same field layout as pyautogui's Box, so relocation results stay interchangeable
+Box = collections.namedtuple('Box', ['left', 'top', 'width', 'height'])
+
+# mss instances hold per-thread OS handles, so keep one per thread
+_capture_local = threading.local()
+
+def _get_mss():
+    """Return this thread's reusable mss grabber (created on first use)."""
+    sct = getattr(_capture_local, 'sct', None)
+    if sct is None:
+        sct = mss.mss()
+        _capture_local.sct = sct
+    return sct
+
+def grab_region_bgr(region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    Capture a screen region as a BGR uint8 ndarray (OpenCV layout).
+    region is (x, y, width, height); None captures the primary screen.
+    """
+    if region is None:
+        screen_w, screen_h = pyautogui.size()
+        region = (0, 0, screen_w, screen_h)
+    x, y, w, h = (int(v) for v in region)
+    if HAS_MSS:
+        raw = _get_mss().grab({'left': x, 'top': y, 'width': w, 'height': h})
+        # mss exposes the BGRA buffer through the array interface - no PIL round trip
+        return cv2.cvtColor(np.asarray(raw), cv2.COLOR_BGRA2BGR)
+    screenshot = pyautogui.screenshot(region=(x, y, w, h))
+    return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+
+def grab_region_gray(region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    Capture a screen region straight to a single-channel grayscale ndarray.
+    Converts the raw BGRA (mss) / RGB (pyautogui) buffer in one pass, without a BGR intermediate.
+    """
+    if region is None:
+        screen_w, screen_h = pyautogui.size()
+        region = (0, 0, screen_w, screen_h)
+    x, y, w, h = (int(v) for v in region)
+    if HAS_MSS:
+        raw = _get_mss().grab({'left': x, 'top': y, 'width': w, 'height': h})
+        return cv2.cvtColor(np.asarray(raw), cv2.COLOR_BGRA2GRAY)
+    screenshot = pyautogui.screenshot(region=(x, y, w, h))
+    return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2GRAY)
+
+# --- Template Image Cache ---
+# Decoded template PNGs keyed by (path, grayscale); templates never change while running
+_template_image_cache: Dict[Tuple[str, bool], np.ndarray] = {}
+
+def load_template(template_path: str, grayscale: bool = False) -> Optional[np.ndarray]:
+    """
+    Load a template image once and reuse it: BGR by default, single-channel when grayscale=True.
+    Returns None if the file cannot be read. Failed reads are not cached here, but DetectionModule
+    skips any template path that was missing when it was created (_missing_template_paths) for the
+    rest of the process, so a template file added after startup needs a restart to be used.
+    """
+    key = (template_path, grayscale)
+    image = _template_image_cache.get(key)
+    if image is None:
+        image = cv2.imread(template_path)
+        if image is None:
+            return None
+        if grayscale:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _template_image_cache[key] = image
+    return image
+
 # --- Helper Functions for Extended Screenshot ---
 def capture_extended_bubble_screenshot(bubble_region_tuple, extension_left=AVATAR_EXTENSION_PX):
-    """擴展泡泡截圖範圍，向左擴展指定像素以包含頭像"""
+    """擴展泡泡截圖範圍，向左擴展指定像素以包含頭像（返回 BGR ndarray）"""
     x, y, w, h = bubble_region_tuple
     extended_region = (max(0, x - extension_left), y, w + extension_left, h)
-    return pyautogui.screenshot(region=extended_region), extension_left
+    return grab_region_bgr(extended_region), extension_left
 
 def compensate_coordinates_for_extended_screenshot(bubble_box, extension_px=AVATAR_EXTENSION_PX):
     """將擴展截圖中的座標轉換為螢幕絕對座標"""
@@ -564,8 +810,34 @@ def get_windows_dpi_scale():
         _cached_dpi_scale = 1.0
         return 1.0
 
+def request_timer_resolution(period_ms: int = 1):
+    """
+    Windows 預設計時器解析度約 15.6ms，10ms 的輪詢/短 sleep 會被拉長；要求 period_ms 的解析度。
+    Returns the winmm handle (pass it to timeEndPeriod(period_ms) when done), or None off Windows.
+    """
+    try:
+        import ctypes
+        winmm = ctypes.windll.winmm
+        winmm.timeBeginPeriod(period_ms)
+        return winmm
+    except (AttributeError, OSError):
+        return None # Not Windows (no ctypes.windll) or winmm unavailable
+
+# Global safe click region cache (config and DPI are fixed for the session)
+_cached_safe_region = None
+
+def reset_safe_region_cache():
+    """清除安全點擊區域快取（遊戲視窗設定變更後呼叫）"""
+    global _cached_safe_region
+    _cached_safe_region = None
+
 def calculate_safe_click_region():
-    """計算安全點擊區域，考慮DPI縮放並基於config中的遊戲視窗設定，內縮5px作為安全區域"""
+    """計算安全點擊區域，考慮DPI縮放並基於config中的遊戲視窗設定，內縮5px作為安全區域（帶緩存）"""
+    global _cached_safe_region
+
+    if _cached_safe_region is not None:
+        return _cached_safe_region
+
     # 獲取DPI縮放因子
     scale_factor = get_windows_dpi_scale()
     
@@ -599,14 +871,224 @@ def calculate_safe_click_region():
     safe_x_max = actual_x + actual_width - safe_margin
     safe_y_max = actual_y + actual_height - safe_margin
     
-    return (safe_x_min, safe_y_min, safe_x_max, safe_y_max)
+    _cached_safe_region = (safe_x_min, safe_y_min, safe_x_max, safe_y_max)
+    return _cached_safe_region
 
 def is_click_position_safe(x: int, y: int) -> bool:
     """檢查點擊位置是否在安全區域內"""
     safe_x_min, safe_y_min, safe_x_max, safe_y_max = calculate_safe_click_region()
     return safe_x_min <= x <= safe_x_max and safe_y_min <= y <= safe_y_max
 
+# Shared pool for independent template searches (OpenCV matchTemplate releases the GIL)
+_TEMPLATE_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="template_search")
+# Single background writer for visual-debug images, so PNG encoding and disk I/O stay off the detection path
+_DEBUG_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug_writer")
+
+def _report_debug_write(future) -> None:
+    """Done-callback for save_debug_image: surface write errors that would otherwise be swallowed."""
+    try:
+        if not future.result():
+            print("Error: cv2.imwrite failed to write a debug image")
+    except Exception as e:
+        print(f"Error writing debug image: {e}")
+
+def save_debug_image(path: str, image: np.ndarray) -> None:
+    """
+    Queue image to be written to path on the background debug writer.
+    The caller must not modify image afterwards (pass a copy if the buffer is reused).
+    """
+    _DEBUG_WRITER.submit(cv2.imwrite, path, image).add_done_callback(_report_debug_write)
+
 # --- Helper Function (Module Level) ---
+def put_latest(q: queue.Queue, item) -> None:
+    """
+    Non-blocking put for bounded queues: if q is full, drop the oldest item to make room.
+    Keeps a stalled consumer from pinning an ever-growing backlog of bubble snapshots.
+    """
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                dropped = q.get_nowait()
+                print(f"Warning: Queue full, dropped oldest item (sender: {dropped.get('sender') if isinstance(dropped, dict) else '?'})")
+            except queue.Empty:
+                pass # Consumer drained it in between; retry the put
+
+def abs_peak(res: np.ndarray) -> Tuple[float, Tuple[int, int], float]:
+    """
+    Peak of |res| for a matchTemplate result, without materializing np.abs(res).
+    Returns (abs_value, (x, y), signed value at that location).
+    """
+    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+    if -min_val > max_val:
+        return -min_val, min_loc, min_val
+    return max_val, max_loc, max_val
+
+def match_template_coarse_to_fine(image: np.ndarray, image_half: Optional[np.ndarray], template: np.ndarray,
+                                  coarse_threshold: float = KEYWORD_PYRAMID_COARSE_CONFIDENCE,
+                                  pad: int = KEYWORD_PYRAMID_REFINE_PAD) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """
+    Two-level pyramid TM_CCOEFF_NORMED: match template at half resolution against image_half
+    (cv2.pyrDown(image)), then re-match at full resolution only in a small window around the
+    coarse |peak|. Returns (res, (offset_x, offset_y)) where res covers the refined window and the
+    offset places it in image, or (None, (0, 0)) if the coarse |peak| is below coarse_threshold.
+    Falls back to one full-resolution match when image_half is None or the template is too small.
+    """
+    template_h, template_w = template.shape[:2]
+    if image_half is None or min(template_h, template_w) < KEYWORD_PYRAMID_MIN_TEMPLATE_SIDE:
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED), (0, 0)
+
+    template_half = cv2.pyrDown(template)
+    if image_half.shape[0] < template_half.shape[0] or image_half.shape[1] < template_half.shape[1]:
+        return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED), (0, 0)
+    coarse_res = cv2.matchTemplate(image_half, template_half, cv2.TM_CCOEFF_NORMED)
+    coarse_val, (coarse_x, coarse_y), _ = abs_peak(coarse_res) # |peak| keeps inverted matches
+    if coarse_val < coarse_threshold:
+        return None, (0, 0)
+
+    image_h, image_w = image.shape[:2]
+    x0 = max(0, coarse_x * 2 - pad)
+    y0 = max(0, coarse_y * 2 - pad)
+    x1 = min(image_w, coarse_x * 2 + template_w + pad)
+    y1 = min(image_h, coarse_y * 2 + template_h + pad)
+    return cv2.matchTemplate(image[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED), (x0, y0)
+
+def score_match(res: np.ndarray, template_w: int, template_h: int, region_x: int, region_y: int,
+                threshold: float) -> Optional[Tuple[float, int, int, bool]]:
+    """
+    Score a matchTemplate result for keyword detection, counting inverted matches too.
+    TM_CCOEFF_NORMED against bitwise_not(template) is exactly -res, so the best normal-or-inverted
+    score is the peak of |res|. Returns (confidence, abs_center_x, abs_center_y, is_inverted),
+    or None if the peak is below threshold.
+    """
+    confidence, (loc_x, loc_y), signed_val = abs_peak(res)
+    if confidence < threshold:
+        return None
+    # *** COORDINATE CORRECTION *** (relative center + region origin = absolute screen coords)
+    center_x = region_x + loc_x + template_w // 2
+    center_y = region_y + loc_y + template_h // 2
+    # Inverted when the signed score at the peak is well below its magnitude
+    is_inverted = (signed_val < confidence - 0.05)
+    return confidence, center_x, center_y, is_inverted
+
+def match_corner_pairs(tl_boxes: List[Tuple[int, int, int, int]],
+                       br_boxes: List[Tuple[int, int, int, int]]) -> np.ndarray:
+    """
+    Pair bubble corners: for each TL box, the index of the BR box that lies right of it (> 20px)
+    and below it (> 10px) with the smallest Y difference, or -1 if none qualifies.
+    Equal Y differences go to the BR closest in X, then to the first BR in list order.
+    """
+    tl = np.asarray(tl_boxes, dtype=np.int64).reshape(-1, 4)
+    br = np.asarray(br_boxes, dtype=np.int64).reshape(-1, 4)
+    dx = br[None, :, 0] - tl[:, None, 0]
+    dy = br[None, :, 1] - tl[:, None, 1]
+    valid = (dx > 20) & (dy > 10)
+    # Lexicographic (Y difference, X difference) as one int64 key: both are positive on valid pairs
+    # and screen coordinates stay far below 2**31, so argmin orders by dy first, then dx
+    pair_key = np.where(valid, (dy << 31) + dx, np.iinfo(np.int64).max)
+    best = pair_key.argmin(axis=1)
+    best[~valid.any(axis=1)] = -1
+    return best
+
+def _best_overlap_in_bucket(results_a: List[Dict[str, Any]], results_b: List[Dict[str, Any]],
+                            idx_a: List[int], idx_b: List[int],
+                            max_dist_sq: float) -> Optional[Tuple[float, int, int, int]]:
+    """
+    Best overlapping pair among results_a[idx_a] x results_b[idx_b] (all of one template).
+    Returns (combined_confidence, index_a, index_b, dist_sq) or None; the first pair wins ties.
+    """
+    if len(idx_a) * len(idx_b) <= 4:
+        # A handful of pairs: a plain loop beats building arrays
+        best = None
+        for i in idx_a:
+            center_a, conf_a = results_a[i]['center'], results_a[i]['confidence']
+            for j in idx_b:
+                dx = center_a[0] - results_b[j]['center'][0]
+                dy = center_a[1] - results_b[j]['center'][1]
+                dist_sq = dx * dx + dy * dy
+                if dist_sq < max_dist_sq:
+                    combined_confidence = (conf_a + results_b[j]['confidence']) / 2
+                    if best is None or combined_confidence > best[0]:
+                        best = (combined_confidence, i, j, dist_sq)
+        return best
+
+    xy_a = np.array([results_a[i]['center'] for i in idx_a], dtype=np.int64)
+    xy_b = np.array([results_b[j]['center'] for j in idx_b], dtype=np.int64)
+    conf_a = np.array([results_a[i]['confidence'] for i in idx_a], dtype=np.float64)
+    conf_b = np.array([results_b[j]['confidence'] for j in idx_b], dtype=np.float64)
+    dist_sq = ((xy_a[:, None, 0] - xy_b[None, :, 0]) ** 2 +
+               (xy_a[:, None, 1] - xy_b[None, :, 1]) ** 2)
+    combined = np.where(dist_sq < max_dist_sq, (conf_a[:, None] + conf_b[None, :]) / 2, -1.0)
+    row, col = np.unravel_index(combined.argmax(), combined.shape) # argmax keeps the first of equal maxima
+    if combined[row, col] < 0:
+        return None
+    return float(combined[row, col]), idx_a[row], idx_b[col], int(dist_sq[row, col])
+
+def best_overlap_pair(results_a: List[Dict[str, Any]], results_b: List[Dict[str, Any]],
+                      max_distance: float) -> Optional[Tuple[int, int, float]]:
+    """
+    Among keyword results pairs (a, b) with the same 'template' and 'center's closer than
+    max_distance, pick the one with the highest average 'confidence' (first pair wins ties).
+    Returns (index_a, index_b, center_distance) or None if no pair overlaps.
+    """
+    if not results_a or not results_b:
+        return None
+    # Only results of the same template can pair up: compare within per-template buckets
+    buckets_a: Dict[str, List[int]] = collections.defaultdict(list)
+    buckets_b: Dict[str, List[int]] = collections.defaultdict(list)
+    for i, match in enumerate(results_a):
+        buckets_a[match['template']].append(i)
+    for j, match in enumerate(results_b):
+        buckets_b[match['template']].append(j)
+
+    max_dist_sq = max_distance ** 2
+    best = None
+    for template in buckets_a.keys() & buckets_b.keys():
+        candidate = _best_overlap_in_bucket(results_a, results_b, buckets_a[template], buckets_b[template], max_dist_sq)
+        if candidate is None:
+            continue
+        # Highest confidence; on equal confidence the earlier (index_a, index_b) pair, as a single scan would pick
+        if best is None or candidate[0] > best[0] or (candidate[0] == best[0] and candidate[1:3] < best[1:3]):
+            best = candidate
+    if best is None:
+        return None
+    _, i, j, dist_sq = best
+    return i, j, math.sqrt(dist_sq)
+
+class ProximityGrid:
+    """
+    Set of (x, y) points answering "is there a stored point within tolerance on both axes?" in O(1).
+    Points are bucketed into tolerance-sized cells, so any match lies in the 3x3 cells around the query.
+    """
+    def __init__(self, tolerance: int):
+        self.tolerance = max(1, int(tolerance))
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+
+    def _cell(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        return (int(point[0]) // self.tolerance, int(point[1]) // self.tolerance)
+
+    def add(self, point: Tuple[int, int]) -> None:
+        self._cells.setdefault(self._cell(point), []).append(point)
+
+    def has_near(self, point: Tuple[int, int]) -> bool:
+        cell_x, cell_y = self._cell(point)
+        tol = self.tolerance
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in self._cells.get((cell_x + dx, cell_y + dy), ()):
+                    if abs(other[0] - point[0]) <= tol and abs(other[1] - point[1]) <= tol:
+                        return True
+        return False
+
+def wait_for_command(command_queue: queue.Queue, timeout: float) -> Optional[Dict[str, Any]]:
+    """Block up to timeout seconds for the next command. Returns it, or None if none arrived."""
+    try:
+        return command_queue.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
 def are_bboxes_similar(bbox1: Optional[Tuple[int, int, int, int]],
                        bbox2: Optional[Tuple[int, int, int, int]],
                        tolerance: int = BBOX_SIMILARITY_TOLERANCE) -> bool:
@@ -636,12 +1118,27 @@ class DetectionModule:
         self.state_confidence = state_confidence
         self.region = region
         self._warned_paths = set()
+        # Template files are checked once here instead of a stat() per search
+        self._missing_template_paths = {path for path in templates.values() if path and not os.path.exists(path)}
 
         # --- Dual Method Specific Initialization ---
         self.use_dual_method = use_dual_method
         self.clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_SIZE)
+        # GPU CLAHE (CUDA builds of OpenCV only); upload/result buffers are reused between calls
+        self._gpu_clahe = None
+        if HAS_CUDA:
+            try:
+                self._gpu_clahe = cv2.cuda.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_SIZE)
+                self._gpu_src = cv2.cuda_GpuMat()
+                self._gpu_dst = cv2.cuda_GpuMat()
+                self._gpu_lock = threading.Lock()
+                print("DetectionModule: CUDA device found, CLAHE runs on the GPU")
+            except cv2.error as e:
+                print(f"DetectionModule: CUDA CLAHE unavailable ({e}), using CPU CLAHE")
+                self._gpu_clahe = None
         self.core_keyword_templates = {k: v for k, v in templates.items()
                                        if k in ['keyword_wolf_lower', 'keyword_Wolf_upper', 'keyword_wolf_reply']}
+        self._template_clahe_cache: Dict[str, np.ndarray] = {} # template path -> CLAHE-enhanced grayscale template
         self.last_detection_method = None
         self.last_detection_confidence = 0.0
         self.DEBUG_LEVEL = DEBUG_LEVEL # Use global debug level
@@ -658,7 +1155,8 @@ class DetectionModule:
             'inverted_matches': 0,
             'adaptive_threshold_successes': 0,
             'stability_waits': 0,
-            'verification_failures': 0
+            'verification_failures': 0,
+            'template_hits': collections.Counter() # Final matches per core keyword template (orders the search)
         }
         # --- End Dual Method Specific Initialization ---
         
@@ -681,12 +1179,90 @@ class DetectionModule:
         self.eco_mode_threshold = ECO_MODE_THRESHOLD  # 觸發經濟模式的閾值
         self.eco_mode_interval = ECO_MODE_INTERVAL  # 經濟模式的檢測間隔（秒）
         self.eco_mode_region = ECO_MODE_REGION  # 固定監控區域
-        self.last_eco_screenshot = None  # 上次經濟模式截圖的numpy array
-        self.eco_mode_start_time = None  # 經濟模式開始時間
+        self.last_eco_screenshot = None  # 上次經濟模式截圖（縮小後的灰度 numpy array）
+        self.eco_mode_start_time = None  # 經濟模式開始時間（time.monotonic()）
         self.eco_mode_wakeup_interval = ECO_MODE_WAKEUP_INTERVAL  # 強制喚醒間隔（秒）
+        # 上次泡泡偵測的畫面與結果（method -> (region, frame, bubbles)），畫面未變時直接重用結果
+        self._last_bubble_frames: Dict[str, Tuple[Tuple[int, int, int, int], np.ndarray, List[Dict[str, Any]]]] = {}
+        # 最近一次泡泡區域截圖 (monotonic 時間, region, BGR)，供區域內的關鍵字偵測直接裁切重用
+        self._frame_cache: Optional[Tuple[float, Tuple[int, int, int, int], np.ndarray]] = None
+        # 最近一次 UI 狀態判斷 (monotonic 時間, state)，短時間內重複查詢直接回傳
+        self._ui_state_cache: Optional[Tuple[float, str]] = None
+        # 顏色偵測重複使用的緩衝區（HSV/遮罩/形態學核），避免每次偵測重新配置
+        self._morph_kernel = np.ones((3, 3), np.uint8)
+        self._scratch: Dict[str, np.ndarray] = {}
         
         print(f"DetectionModule initialized. Color Detection: {'Enabled' if self.use_color_detection else 'Disabled'}. Dual Keyword Method: {'Enabled' if self.use_dual_method else 'Disabled'}")
 
+    def _bubbles_if_unchanged(self, method: str, region: Tuple[int, int, int, int],
+                              frame: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+        """
+        Frame-difference gate for bubble detection: if frame is pixel-identical to the last frame
+        the given method ran on (same region), return that run's bubbles; otherwise None.
+        Detection is deterministic, so an unchanged frame always yields the same bubbles.
+        """
+        last = self._last_bubble_frames.get(method)
+        if last is None:
+            return None
+        last_region, last_frame, last_bubbles = last
+        if last_region != region or last_frame.shape != frame.shape:
+            return None
+        # NORM_INF is the largest per-pixel difference (any channel); 0 means nothing changed
+        if cv2.norm(last_frame, frame, cv2.NORM_INF) != 0:
+            return None
+        return [dict(bubble) for bubble in last_bubbles]
+
+    def _remember_bubbles(self, method: str, region: Tuple[int, int, int, int],
+                          frame: np.ndarray, bubbles: List[Dict[str, Any]]) -> None:
+        """Store the frame and bubbles of a completed detection run for _bubbles_if_unchanged."""
+        self._last_bubble_frames[method] = (region, frame, [dict(bubble) for bubble in bubbles])
+
+    def _cache_frame(self, region: Tuple[int, int, int, int], frame_bgr: np.ndarray) -> None:
+        """Remember a fresh BGR capture of region so other detections can crop it instead of recapturing."""
+        self._frame_cache = (time.monotonic(), tuple(int(v) for v in region), frame_bgr)
+
+    def _cached_crop(self, region: Tuple[int, int, int, int], grayscale: bool = True) -> Optional[np.ndarray]:
+        """
+        Crop region out of the cached capture if it is younger than FRAME_CACHE_MAX_AGE and fully
+        contains region. Returns a grayscale crop (or a BGR view with grayscale=False), else None.
+        """
+        cache = self._frame_cache
+        if cache is None:
+            return None
+        captured_at, (cache_x, cache_y, cache_w, cache_h), frame_bgr = cache
+        if time.monotonic() - captured_at > FRAME_CACHE_MAX_AGE:
+            return None
+        x, y, w, h = (int(v) for v in region)
+        if x < cache_x or y < cache_y or x + w > cache_x + cache_w or y + h > cache_y + cache_h:
+            return None
+        crop = frame_bgr[y - cache_y:y - cache_y + h, x - cache_x:x - cache_x + w]
+        if grayscale:
+            return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return crop
+
+    def _log(self, level: int, fmt: str, *args) -> None:
+        """print(fmt % args) only when DEBUG_LEVEL >= level, so hot paths skip the string formatting otherwise."""
+        if self.DEBUG_LEVEL < level:
+            return
+        print(fmt % args if args else fmt)
+
+    def _scratch_buffer(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Reusable work buffer for OpenCV dst= arguments; reallocated only when the shape changes."""
+        buffer = self._scratch.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._scratch[name] = buffer
+        return buffer
+
+    def _get_template_clahe(self, template_path: str, template_gray: np.ndarray) -> Optional[np.ndarray]:
+        """CLAHE-enhanced version of a (static) grayscale template, computed once per path."""
+        template_clahe = self._template_clahe_cache.get(template_path)
+        if template_clahe is None:
+            template_clahe = self._apply_clahe(template_gray)
+            if template_clahe is not None:
+                self._template_clahe_cache[template_path] = template_clahe
+        return template_clahe
+
     def _apply_clahe(self, image):
         """Apply CLAHE to enhance image contrast."""
         if image is None:
@@ -696,7 +1272,16 @@ class DetectionModule:
             if len(image.shape) == 3:
                 gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             else:
-                gray = image.copy() # Assume already grayscale
+                gray = image # Assume already grayscale (CLAHE does not modify its input)
+            if self._gpu_clahe is not None:
+                try:
+                    with self._gpu_lock:
+                        self._gpu_src.upload(gray)
+                        self._gpu_clahe.apply(self._gpu_src, cv2.cuda.Stream_Null(), self._gpu_dst)
+                        return self._gpu_dst.download()
+                except cv2.error as e:
+                    print(f"GPU CLAHE failed ({e}), falling back to CPU CLAHE")
+                    self._gpu_clahe = None
             enhanced = self.clahe.apply(gray)
             return enhanced
         except Exception as e:
@@ -728,71 +1313,152 @@ class DetectionModule:
             print(f"[Icon Prep] Error preparing icon: {e}")
             return None
 
-    def _find_template(self, template_key: str, confidence: Optional[float] = None, region: Optional[Tuple[int, int, int, int]] = None, grayscale: bool = False) -> List[Tuple[int, int]]:
-        """Internal helper to find a template by its key using PyAutoGUI. Returns list of CENTER coordinates (absolute)."""
-        template_path = self.templates.get(template_key)
-        if not template_path:
-            print(f"Error: Template key '{template_key}' not found in provided templates.")
-            return []
+    def capture_frame(self, region: Optional[Tuple[int, int, int, int]] = None, grayscale: bool = True) -> np.ndarray:
+        """Capture a region (defaults to self.region). Grayscale by default; pass grayscale=False for BGR."""
+        region = region if region is not None else self.region
+        if grayscale:
+            return grab_region_gray(region)
+        return grab_region_bgr(region)
+
+    def screen_fingerprint(self, region: Optional[Tuple[int, int, int, int]] = None) -> int:
+        """CRC32 of a grayscale capture of region (defaults to self.region) to detect 'nothing changed on screen'."""
+        frame = self.capture_frame(region)
+        # Equality check only, not cryptographic: crc32 reads the array buffer directly, no tobytes() copy
+        return zlib.crc32(np.ascontiguousarray(frame))
+
+    def _use_grayscale(self, template_key: str, grayscale: Optional[bool]) -> bool:
+        """Resolve the grayscale flag: explicit values win, otherwise only color-sensitive templates match in color."""
+        if grayscale is not None:
+            return grayscale
+        return template_key not in COLOR_SENSITIVE_TEMPLATE_KEYS
+
+    def locate_snapshot(self, snapshot: np.ndarray, region: Optional[Tuple[int, int, int, int]],
+                        confidence: float = BUBBLE_RELOCATE_CONFIDENCE,
+                        frame: Optional[np.ndarray] = None) -> Optional[Box]:
+        """
+        Re-locate a BGR snapshot (e.g. bubble_snapshot) inside region with cv2.matchTemplate.
+        Drop-in replacement for pyautogui.locateOnScreen(snapshot, region=..., confidence=...).
+        Matching runs on grayscale; frame may be a grayscale capture of region taken earlier,
+        otherwise a fresh one is grabbed.
+        Returns an absolute Box(left, top, width, height) or None.
+        """
+        located = self.locate_snapshot_scored(snapshot, region, frame=frame)
+        if located is None or located[1] < confidence:
+            return None
+        return located[0]
 
-        # Check if template file exists, warn only once
-        if not os.path.exists(template_path):
-            if template_path not in self._warned_paths:
-                print(f"Error: Template image doesn't exist: {template_path}")
-                self._warned_paths.add(template_path)
-            return []
+    def locate_snapshot_scored(self, snapshot: np.ndarray, region: Optional[Tuple[int, int, int, int]],
+                               frame: Optional[np.ndarray] = None) -> Optional[Tuple[Box, float]]:
+        """
+        Like locate_snapshot, but without a threshold: returns (best Box, TM_CCOEFF_NORMED score),
+        or None if the snapshot cannot be matched. Lets callers with a confidence cascade match once.
+        """
+        if snapshot is None:
+            return None
+        if region is None:
+            screen_w, screen_h = pyautogui.size()
+            region = (0, 0, screen_w, screen_h)
+        if frame is None:
+            frame = self.capture_frame(region)
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if snapshot.ndim == 3:
+            snapshot = cv2.cvtColor(snapshot, cv2.COLOR_BGR2GRAY)
+
+        snap_h, snap_w = snapshot.shape[:2]
+        if frame.shape[0] < snap_h or frame.shape[1] < snap_w:
+            return None
 
-        locations = []
-        current_region = region if region is not None else self.region
-        current_confidence = confidence if confidence is not None else self.confidence
+        result = cv2.matchTemplate(frame, snapshot, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return Box(int(region[0]) + max_loc[0], int(region[1]) + max_loc[1], snap_w, snap_h), max_val
 
+    def _locate_all(self, template_key: str, confidence: Optional[float] = None,
+                    region: Optional[Tuple[int, int, int, int]] = None,
+                    grayscale: Optional[bool] = None) -> np.ndarray:
+        """
+        Drop-in for pyautogui.locateAllOnScreen on a template key: one capture of region (default
+        self.region, else the whole screen) searched with the cached template array.
+        Returns an int64 (k, 4) array of absolute (left, top, width, height) boxes.
+        """
+        current_region = region if region is not None else self.region
+        if current_region is None:
+            screen_w, screen_h = pyautogui.size()
+            current_region = (0, 0, screen_w, screen_h)
+        use_grayscale = self._use_grayscale(template_key, grayscale)
         try:
-            # locateAllOnScreen returns Box objects (left, top, width, height)
-            matches = pyautogui.locateAllOnScreen(template_path, region=current_region, confidence=current_confidence, grayscale=grayscale)
-            if matches:
-                for box in matches:
-                    # Calculate center coordinates from the Box object
-                    center_x = box.left + box.width // 2
-                    center_y = box.top + box.height // 2
-                    locations.append((center_x, center_y))
-            # print(f"Found template '{template_key}' at {len(locations)} locations.") # Debug
-            return locations
+            frame = self.capture_frame(current_region, grayscale=use_grayscale)
         except Exception as e:
-            print(f"Error finding template '{template_key}' ({template_path}): {e}")
-            return []
-
-    def _find_template_raw(self, template_key: str, confidence: Optional[float] = None, region: Optional[Tuple[int, int, int, int]] = None, grayscale: bool = False) -> List[Tuple[int, int, int, int]]:
+            print(f"Error capturing region {current_region} for template '{template_key}': {e}")
+            return np.empty((0, 4), dtype=np.int64)
+        return self._find_template_raw_in_image(None if use_grayscale else frame, template_key, current_region,
+                                                confidence=confidence, grayscale=use_grayscale,
+                                                frame_gray=frame if use_grayscale else None)
+
+    def _find_template(self, template_key: str, confidence: Optional[float] = None, region: Optional[Tuple[int, int, int, int]] = None, grayscale: Optional[bool] = None) -> List[Tuple[int, int]]:
+        """Internal helper to find a template by its key. Returns list of CENTER coordinates (absolute)."""
+        boxes = self._locate_all(template_key, confidence=confidence, region=region, grayscale=grayscale)
+        # Calculate center coordinates from the (left, top, width, height) boxes
+        return [(left + width // 2, top + height // 2) for left, top, width, height in boxes.tolist()]
+
+    def _find_template_raw(self, template_key: str, confidence: Optional[float] = None, region: Optional[Tuple[int, int, int, int]] = None, grayscale: Optional[bool] = None) -> List[Tuple[int, int, int, int]]:
         """Internal helper to find a template by its key. Returns list of raw Box tuples (left, top, width, height)."""
+        if self.DEBUG_LEVEL > 1:
+            print(f"DEBUG: Searching for template '{template_key}' with confidence {confidence if confidence is not None else self.confidence}...")
+        boxes = self._locate_all(template_key, confidence=confidence, region=region, grayscale=grayscale)
+        return [tuple(box) for box in boxes.tolist()]
+
+    def _find_template_raw_in_image(self, frame_bgr: Optional[np.ndarray], template_key: str,
+                                    region: Tuple[int, int, int, int],
+                                    confidence: Optional[float] = None,
+                                    grayscale: Optional[bool] = None,
+                                    frame_gray: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Like _find_template_raw, but searches an already captured frame of region instead of grabbing the screen.
+        Same semantics as pyautogui's OpenCV backend: every position scoring above confidence, row-major order.
+        frame_gray may be passed in so callers searching many templates convert the frame only once;
+        frame_bgr may then be None if only grayscale templates are searched.
+        Returns an int64 array of shape (k, 4) with absolute (left, top, width, height) rows.
+        """
+        no_boxes = np.empty((0, 4), dtype=np.int64)
         template_path = self.templates.get(template_key)
         if not template_path:
             print(f"Error: Template key '{template_key}' not found in provided templates.")
-            return []
-        if not os.path.exists(template_path):
+            return no_boxes
+        if template_path in self._missing_template_paths:
             if template_path not in self._warned_paths:
                 print(f"Error: Template image doesn't exist: {template_path}")
                 self._warned_paths.add(template_path)
-            return []
+            return no_boxes
 
-        locations = []
-        current_region = region if region is not None else self.region
         current_confidence = confidence if confidence is not None else self.confidence
+        use_grayscale = self._use_grayscale(template_key, grayscale)
+        needle = load_template(template_path, grayscale=use_grayscale)
+        if needle is None:
+            print(f"Error finding template raw '{template_key}' ({template_path}): image could not be read")
+            return no_boxes
+        if use_grayscale:
+            haystack = frame_gray if frame_gray is not None else cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        else:
+            haystack = frame_bgr
+
+        needle_h, needle_w = needle.shape[:2]
+        if haystack.shape[0] < needle_h or haystack.shape[1] < needle_w:
+            return no_boxes
         try:
-            # --- Temporary Debug Print ---
-            print(f"DEBUG: Searching for template '{template_key}' with confidence {current_confidence}...")
-            # --- End Temporary Debug Print ---
-            matches = pyautogui.locateAllOnScreen(template_path, region=current_region, confidence=current_confidence, grayscale=grayscale)
-            match_count = 0 # Initialize count
-            if matches:
-                for box in matches:
-                    locations.append((box.left, box.top, box.width, box.height))
-                    match_count += 1 # Increment count
-            # --- Temporary Debug Print ---
-            print(f"DEBUG: Found {match_count} instance(s) of template '{template_key}'.")
-            # --- End Temporary Debug Print ---
-            return locations
-        except Exception as e:
+            result = cv2.matchTemplate(haystack, needle, cv2.TM_CCOEFF_NORMED)
+        except cv2.error as e:
             print(f"Error finding template raw '{template_key}' ({template_path}): {e}")
-            return []
+            return no_boxes
+        match_ys, match_xs = np.nonzero(result > current_confidence)
+        locations = np.empty((len(match_xs), 4), dtype=np.int64)
+        locations[:, 0] = match_xs + int(region[0])
+        locations[:, 1] = match_ys + int(region[1])
+        locations[:, 2] = needle_w
+        locations[:, 3] = needle_h
+        if self.DEBUG_LEVEL > 1:
+            print(f"DEBUG: Found {len(locations)} instance(s) of template '{template_key}'.")
+        return locations
 
     def _detect_position_icon_multi_strategy(self, search_region: Tuple[int, int, int, int],
                                              bubble_center: Tuple[int, int],
@@ -824,9 +1490,7 @@ class DetectionModule:
 
         # Capture screen region once
         try:
-            screenshot = pyautogui.screenshot(region=search_region)
-            img_bgr = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-            img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+            img_gray = self.capture_frame(search_region)
             img_clahe = self._apply_clahe(img_gray)
         except Exception as e:
             print(f"[Position Detection] Error capturing/preprocessing screen: {e}")
@@ -854,20 +1518,19 @@ class DetectionModule:
         # Process each template
         for name, template_key in position_templates.items():
             template_path = self.templates.get(template_key)
-            if not template_path or not os.path.exists(template_path):
+            if not template_path or template_path in self._missing_template_paths:
                 if template_path and template_path not in self._warned_paths:
                     print(f"[Position Detection] Template not found: {template_path}")
                     self._warned_paths.add(template_path)
                 continue
 
             try:
-                template_bgr = cv2.imread(template_path)
-                if template_bgr is None:
+                template_gray = load_template(template_path, grayscale=True)
+                if template_gray is None:
                     print(f"[Position Detection] Failed to load template: {template_path}")
                     continue
 
-                template_gray = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2GRAY)
-                template_clahe = self._apply_clahe(template_gray)
+                template_clahe = self._get_template_clahe(template_path, template_gray)
 
                 if template_clahe is None:
                     print(f"[Position Detection] CLAHE preprocessing failed for {name}")
@@ -1062,98 +1725,72 @@ class DetectionModule:
         # --- Fallback to Template Matching ---
         print("Executing template matching for bubble detection...")
         all_bubbles_info = []
-        processed_tls = set() # Keep track of TL corners already used in a bubble
+        # TL corners already used in a bubble; near-duplicates (within coordinate_tolerance) count as used
+        processed_tls = ProximityGrid(self.coordinate_tolerance)
 
         # --- Find ALL Regular Bubble Corners (Raw Coordinates) ---
         regular_tl_keys = ['corner_tl', 'corner_tl_type2', 'corner_tl_type3', 'corner_tl_type4'] # Added type4
         regular_br_keys = ['corner_br', 'corner_br_type2', 'corner_br_type3', 'corner_br_type4'] # Added type4
 
         bubble_detection_region = BUBBLE_DETECTION_REGION_TEMPLATE  # 使用模板匹配專用區域
-        print(f"DEBUG: Using specific region for bubble corner detection: {bubble_detection_region}")
-
-        all_regular_tl_boxes = []
-        for key in regular_tl_keys:
-            all_regular_tl_boxes.extend(self._find_template_raw(key, region=bubble_detection_region)) # Pass region
+        if self.DEBUG_LEVEL > 1:
+            print(f"DEBUG: Using specific region for bubble corner detection: {bubble_detection_region}")
 
-        all_regular_br_boxes = []
-        for key in regular_br_keys:
-            all_regular_br_boxes.extend(self._find_template_raw(key, region=bubble_detection_region)) # Pass region
+        # Capture the region once and search all corner templates in that single frame
+        corner_keys = regular_tl_keys + regular_br_keys + ['bot_corner_tl', 'bot_corner_br']
+        try:
+            corner_frame = self.capture_frame(bubble_detection_region, grayscale=False)
+            self._cache_frame(bubble_detection_region, corner_frame)
+        except Exception as e:
+            print(f"Error capturing bubble detection region: {e}")
+            return []
+        cached_bubbles = self._bubbles_if_unchanged('template', bubble_detection_region, corner_frame)
+        if cached_bubbles is not None:
+            print(f"Bubble region unchanged since last template matching, reusing {len(cached_bubbles)} bubbles.")
+            return cached_bubbles
+        # Corner keys are colour-sensitive (bot vs user bubbles differ mainly by tint), so they match on the BGR frame.
+        # Run all corner searches concurrently; results are collected in key order so matching stays deterministic
+        futures = {key: _TEMPLATE_POOL.submit(self._find_template_raw_in_image, corner_frame, key,
+                                              bubble_detection_region)
+                   for key in corner_keys}
+        corner_boxes = {key: future.result() for key, future in futures.items()}
+
+        # (k, 4) box arrays, kept as arrays for the broadcasting matcher
+        all_regular_tl_boxes = np.concatenate([corner_boxes[key] for key in regular_tl_keys], axis=0)
+        all_regular_br_boxes = np.concatenate([corner_boxes[key] for key in regular_br_keys], axis=0)
 
         # --- Find Bot Bubble Corners (Raw Coordinates - Single Type) ---
-        bot_tl_boxes = self._find_template_raw('bot_corner_tl', region=bubble_detection_region) # Pass region
-        bot_br_boxes = self._find_template_raw('bot_corner_br', region=bubble_detection_region) # Pass region
+        bot_tl_boxes = corner_boxes['bot_corner_tl']
+        bot_br_boxes = corner_boxes['bot_corner_br']
 
-        # --- Match Regular Bubbles (Any Type TL with Any Type BR) ---
-        if all_regular_tl_boxes and all_regular_br_boxes:
-            for tl_box in all_regular_tl_boxes:
-                tl_coords = (tl_box[0], tl_box[1]) # Extract original TL (left, top)
-                # Skip if this TL is already part of a matched bubble
-                if tl_coords in processed_tls: continue
-
-                potential_br_box = None
-                min_y_diff = float('inf') # Prioritize minimum Y difference
-                # Find the valid BR corner (from any regular type) with the closest Y-coordinate
-                for br_box in all_regular_br_boxes:
-                    br_coords = (br_box[0], br_box[1]) # BR top-left
-                    # Basic geometric check: BR must be below and to the right of TL
-                    if br_coords[0] > tl_coords[0] + 20 and br_coords[1] > tl_coords[1] + 10:
-                        y_diff = abs(br_coords[1] - tl_coords[1]) # Calculate Y difference
-                        if y_diff < min_y_diff:
-                            potential_br_box = br_box
-                            min_y_diff = y_diff
-                        # Optional: Add a secondary check for X distance if Y diff is the same?
-                        # elif y_diff == min_y_diff:
-                        #    if potential_br_box is None or abs(br_coords[0] - tl_coords[0]) < abs(potential_br_box[0] - tl_coords[0]):
-                        #         potential_br_box = br_box
-
-                if potential_br_box:
-                    # Calculate bbox using TL's top-left and BR's bottom-right
-                    bubble_bbox = (tl_coords[0], tl_coords[1],
-                                   potential_br_box[0] + potential_br_box[2], potential_br_box[1] + potential_br_box[3])
-                    all_bubbles_info.append({
-                        'bbox': bubble_bbox,
-                        'is_bot': False,
-                        'tl_coords': tl_coords # Store the original TL coords
-                    })
-                    processed_tls.add(tl_coords) # Mark this TL as used
-
-        # --- Match Bot Bubbles (Single Type) ---
-        if bot_tl_boxes and bot_br_boxes:
-            for tl_box in bot_tl_boxes:
+        # --- Match Regular Bubbles (Any Type TL with Any Type BR), then Bot Bubbles (Single Type) ---
+        for tl_boxes, br_boxes, is_bot in ((all_regular_tl_boxes, all_regular_br_boxes, False),
+                                           (bot_tl_boxes, bot_br_boxes, True)):
+            if len(tl_boxes) == 0 or len(br_boxes) == 0:
+                continue
+            # For every TL at once: the BR below and to the right of it with the closest Y-coordinate
+            best_br_indices = match_corner_pairs(tl_boxes, br_boxes)
+            br_boxes = br_boxes.tolist() # Plain ints for the bubble dicts
+            for tl_box, br_index in zip(tl_boxes.tolist(), best_br_indices.tolist()):
                 tl_coords = (tl_box[0], tl_box[1]) # Extract original TL (left, top)
                 # Skip if this TL is already part of a matched bubble
-                if tl_coords in processed_tls: continue
-
-                potential_br_box = None
-                min_y_diff = float('inf') # Prioritize minimum Y difference
-                # Find the valid BR corner with the closest Y-coordinate
-                for br_box in bot_br_boxes:
-                    br_coords = (br_box[0], br_box[1]) # BR top-left
-                    # Basic geometric check: BR must be below and to the right of TL
-                    if br_coords[0] > tl_coords[0] + 20 and br_coords[1] > tl_coords[1] + 10:
-                        y_diff = abs(br_coords[1] - tl_coords[1]) # Calculate Y difference
-                        if y_diff < min_y_diff:
-                            potential_br_box = br_box
-                            min_y_diff = y_diff
-                        # Optional: Add a secondary check for X distance if Y diff is the same?
-                        # elif y_diff == min_y_diff:
-                        #    if potential_br_box is None or abs(br_coords[0] - tl_coords[0]) < abs(potential_br_box[0] - tl_coords[0]):
-                        #         potential_br_box = br_box
-
-                if potential_br_box:
-                    # Calculate bbox using TL's top-left and BR's bottom-right
-                    bubble_bbox = (tl_coords[0], tl_coords[1],
-                                   potential_br_box[0] + potential_br_box[2], potential_br_box[1] + potential_br_box[3])
-                    all_bubbles_info.append({
-                        'bbox': bubble_bbox,
-                        'is_bot': True,
-                        'tl_coords': tl_coords # Store the original TL coords
-                    })
-                    processed_tls.add(tl_coords) # Mark this TL as used
+                if br_index < 0 or processed_tls.has_near(tl_coords): continue
+
+                potential_br_box = br_boxes[br_index]
+                # Calculate bbox using TL's top-left and BR's bottom-right
+                bubble_bbox = (tl_coords[0], tl_coords[1],
+                               potential_br_box[0] + potential_br_box[2], potential_br_box[1] + potential_br_box[3])
+                all_bubbles_info.append({
+                    'bbox': bubble_bbox,
+                    'is_bot': is_bot,
+                    'tl_coords': tl_coords # Store the original TL coords
+                })
+                processed_tls.add(tl_coords) # Mark this TL as used
 
         # Note: This logic prioritizes matching regular bubbles first, then bot bubbles.
         # Confidence thresholds might need tuning.
         print(f"Template matching found {len(all_bubbles_info)} bubbles.") # Added log
+        self._remember_bubbles('template', bubble_detection_region, corner_frame, all_bubbles_info)
         return all_bubbles_info
 
     def find_dialogue_bubbles_by_color(self, scale_factor=0.5) -> List[Dict[str, Any]]:
@@ -1171,12 +1808,12 @@ class DetectionModule:
 
         try:
             # 1. Capture the specified region
-            screenshot = pyautogui.screenshot(region=bubble_detection_region)
-            if screenshot is None:
-                print("Error: Failed to capture screenshot for color detection.")
-                return []
-            img = np.array(screenshot)
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR) # Convert RGB (from pyautogui) to BGR (for OpenCV)
+            img = self.capture_frame(bubble_detection_region, grayscale=False) # BGR for HSV conversion
+            self._cache_frame(bubble_detection_region, img)
+            cached_bubbles = self._bubbles_if_unchanged('color', bubble_detection_region, img)
+            if cached_bubbles is not None:
+                print(f"Bubble region unchanged since last color detection, reusing {len(cached_bubbles)} bubbles.")
+                return cached_bubbles
 
             # 2. Resize for performance
             if scale_factor < 1.0:
@@ -1195,7 +1832,8 @@ class DetectionModule:
                 current_scale_factor = 1.0
 
             # 3. Convert to HSV color space
-            hsv = cv2.cvtColor(img_small, cv2.COLOR_BGR2HSV)
+            hsv = cv2.cvtColor(img_small, cv2.COLOR_BGR2HSV, dst=self._scratch_buffer('hsv', img_small.shape))
+            mask_shape = img_small.shape[:2]
 
             # 4. Process each configured bubble type
             if not self.bubble_colors:
@@ -1217,17 +1855,22 @@ class DetectionModule:
                 print(f"Processing color type: {name} (Bot: {is_bot}), HSV Lower: {hsv_lower}, HSV Upper: {hsv_upper}, Area: {min_area:.0f}-{max_area:.0f}")
 
                 # 5. Create mask based on HSV range
-                mask = cv2.inRange(hsv, hsv_lower, hsv_upper)
+                mask = cv2.inRange(hsv, hsv_lower, hsv_upper, dst=self._scratch_buffer('mask', mask_shape))
+                if cv2.countNonZero(mask) == 0:
+                    # Nothing in range (e.g. no bot bubbles on screen): closing and labelling would find nothing
+                    continue
 
                 # 6. Morphological operations (Closing) to remove noise and fill holes
-                kernel = np.ones((3, 3), np.uint8)
-                mask_closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2) # Increased iterations
+                mask_closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._morph_kernel, iterations=2, # Increased iterations
+                                               dst=self._scratch_buffer('mask_closed', mask_shape))
 
                 # Optional: Dilation to merge nearby parts?
-                # mask_closed = cv2.dilate(mask_closed, kernel, iterations=1)
+                # mask_closed = cv2.dilate(mask_closed, self._morph_kernel, iterations=1)
 
                 # 7. Find connected components
-                num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(mask_closed)
+                # Spaghetti labelling (BBDT on older OpenCV); the label image goes to a reused scratch buffer
+                num_labels, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(
+                    mask_closed, 8, cv2.CV_32S, CCL_ALGORITHM, labels=self._scratch_buffer('labels', mask_shape, np.int32))
 
                 # 8. Filter components by area and add to results
                 for i in range(1, num_labels): # Skip background label 0
@@ -1272,6 +1915,7 @@ class DetectionModule:
             return [] # Return empty list on error
 
         print(f"Color detection found {len(all_bubbles_info)} bubbles.")
+        self._remember_bubbles('color', bubble_detection_region, img, all_bubbles_info)
         return all_bubbles_info
 
     def _find_keyword_legacy(self, region: Tuple[int, int, int, int]) -> Optional[Tuple[int, int]]:
@@ -1316,21 +1960,25 @@ class DetectionModule:
             print(f"Error: Invalid region provided to find_keyword_dual_method: {region}")
             return None
 
-        start_time = time.time()
+        start_time = time.perf_counter()
         region_x, region_y, region_w, region_h = region
 
         try:
-            screenshot = pyautogui.screenshot(region=region)
-            if screenshot is None:
-                print("Error: Failed to capture screenshot for dual method detection.")
-                return None
-            img = np.array(screenshot)
-            img_bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            if self.DEBUG_LEVEL >= 3:
+                # Visual debug draws on the color capture
+                img_bgr = self._cached_crop(region, grayscale=False)
+                if img_bgr is None:
+                    img_bgr = grab_region_bgr(region)
+                img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+            else:
+                # Bubble detection has usually just captured the area around this region
+                img_gray = self._cached_crop(region)
+                if img_gray is None:
+                    img_gray = grab_region_gray(region)
         except Exception as e:
             print(f"Error capturing or converting screenshot in region {region}: {e}")
             return None
 
-        img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
         img_clahe = self._apply_clahe(img_gray) # Use helper method
 
         if img_clahe is None:
@@ -1338,6 +1986,12 @@ class DetectionModule:
             # Optionally, could proceed with only grayscale matching here, but for simplicity, we return None.
             return None
 
+        # Half-resolution search images for coarse-to-fine matching (built once, shared by all templates)
+        img_gray_half = img_clahe_half = None
+        if min(img_gray.shape[:2]) >= 2 * KEYWORD_PYRAMID_MIN_TEMPLATE_SIDE:
+            img_gray_half = cv2.pyrDown(img_gray)
+            img_clahe_half = cv2.pyrDown(img_clahe)
+
         gray_results = []
         clahe_results = []
         template_types = { # Map core template keys to types
@@ -1346,95 +2000,63 @@ class DetectionModule:
             'keyword_wolf_reply': 'reply'
         }
 
-        for key, template_path in self.core_keyword_templates.items():
-            if not os.path.exists(template_path):
+        # Reply templates first (a 'wolf' keyword can also match inside a reply label), then the
+        # templates that matched most often, so the early exit below usually fires on the first one
+        template_hits = self.performance_stats['template_hits']
+        ordered_templates = sorted(self.core_keyword_templates.items(),
+                                   key=lambda item: (template_types.get(item[0]) != 'reply', -template_hits[item[0]]))
+
+        for key, template_path in ordered_templates:
+            if template_path in self._missing_template_paths:
                 if template_path not in self._warned_paths:
                     print(f"Warning: Core keyword template not found: {template_path}")
                     self._warned_paths.add(template_path)
                 continue
 
-            template_bgr = cv2.imread(template_path)
-            if template_bgr is None:
+            template_gray = load_template(template_path, grayscale=True)
+            if template_gray is None:
                 if template_path not in self._warned_paths:
                     print(f"Warning: Failed to load core keyword template: {template_path}")
                     self._warned_paths.add(template_path)
                 continue
 
-            template_gray = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2GRAY)
-            template_clahe = self._apply_clahe(template_gray) # Use helper method
+            template_clahe = self._get_template_clahe(template_path, template_gray) # Cached per template
 
             if template_clahe is None:
                  print(f"Warning: CLAHE preprocessing failed for template {key}. Skipping CLAHE match for this template.")
                  continue # Skip CLAHE part for this template
 
-            h_gray, w_gray = template_gray.shape[:2]
-            h_clahe, w_clahe = template_clahe.shape[:2]
-
-            # --- Grayscale Matching ---
-            try:
-                gray_res = cv2.matchTemplate(img_gray, template_gray, cv2.TM_CCOEFF_NORMED)
-                gray_inv_res = cv2.matchTemplate(img_gray, cv2.bitwise_not(template_gray), cv2.TM_CCOEFF_NORMED)
-                gray_combined = np.maximum(gray_res, gray_inv_res)
-                _, gray_max_val, _, gray_max_loc = cv2.minMaxLoc(gray_combined)
-
-                if gray_max_val >= DUAL_METHOD_CONFIDENCE_THRESHOLD:
-                    # Calculate relative center
-                    relative_center_x = gray_max_loc[0] + w_gray // 2
-                    relative_center_y = gray_max_loc[1] + h_gray // 2
-                    # *** COORDINATE CORRECTION ***
-                    absolute_center_x = region_x + relative_center_x
-                    absolute_center_y = region_y + relative_center_y
-
-                    # Check inversion
-                    gray_orig_val = gray_res[gray_max_loc[1], gray_max_loc[0]] # Get value at max_loc from original match
-                    is_inverted = (gray_orig_val < gray_max_val - 0.05)
-
-                    gray_results.append({
-                        'template': key,
-                        'center': (absolute_center_x, absolute_center_y), # Store absolute coords
-                        'confidence': gray_max_val,
-                        'is_inverted': is_inverted,
-                        'type': template_types.get(key, 'standard')
-                    })
-            except cv2.error as e:
-                print(f"OpenCV Error during Grayscale matching for {key}: {e}")
-            except Exception as e:
-                print(f"Unexpected Error during Grayscale matching for {key}: {e}")
-
+            # --- Grayscale Matching, then CLAHE Matching ---
+            key_best_confidence = 0.0
+            for method_name, search_img, search_half, template_img, results in (
+                    ('Grayscale', img_gray, img_gray_half, template_gray, gray_results),
+                    ('CLAHE', img_clahe, img_clahe_half, template_clahe, clahe_results)):
+                try:
+                    res, (offset_x, offset_y) = match_template_coarse_to_fine(search_img, search_half, template_img)
+                    if res is None:
+                        continue # Coarse level found nothing close to this keyword
+                    h, w = template_img.shape[:2]
+                    match = score_match(res, w, h, region_x + offset_x, region_y + offset_y, DUAL_METHOD_CONFIDENCE_THRESHOLD)
+                    if match is not None:
+                        confidence, absolute_center_x, absolute_center_y, is_inverted = match
+                        key_best_confidence = max(key_best_confidence, confidence)
+                        results.append({
+                            'template': key,
+                            'center': (absolute_center_x, absolute_center_y), # Store absolute coords
+                            'confidence': confidence,
+                            'is_inverted': is_inverted,
+                            'type': template_types.get(key, 'standard')
+                        })
+                except cv2.error as e:
+                    print(f"OpenCV Error during {method_name} matching for {key}: {e}")
+                except Exception as e:
+                    print(f"Unexpected Error during {method_name} matching for {key}: {e}")
 
-            # --- CLAHE Matching ---
-            try:
-                clahe_res = cv2.matchTemplate(img_clahe, template_clahe, cv2.TM_CCOEFF_NORMED)
-                clahe_inv_res = cv2.matchTemplate(img_clahe, cv2.bitwise_not(template_clahe), cv2.TM_CCOEFF_NORMED)
-                clahe_combined = np.maximum(clahe_res, clahe_inv_res)
-                _, clahe_max_val, _, clahe_max_loc = cv2.minMaxLoc(clahe_combined)
-
-                if clahe_max_val >= DUAL_METHOD_CONFIDENCE_THRESHOLD:
-                    # Calculate relative center
-                    relative_center_x = clahe_max_loc[0] + w_clahe // 2
-                    relative_center_y = clahe_max_loc[1] + h_clahe // 2
-                    # *** COORDINATE CORRECTION ***
-                    absolute_center_x = region_x + relative_center_x
-                    absolute_center_y = region_y + relative_center_y
-
-                    # Check inversion
-                    clahe_orig_val = clahe_res[clahe_max_loc[1], clahe_max_loc[0]] # Get value at max_loc from original match
-                    is_inverted = (clahe_orig_val < clahe_max_val - 0.05)
-
-                    clahe_results.append({
-                        'template': key,
-                        'center': (absolute_center_x, absolute_center_y), # Store absolute coords
-                        'confidence': clahe_max_val,
-                        'is_inverted': is_inverted,
-                        'type': template_types.get(key, 'standard')
-                    })
-            except cv2.error as e:
-                print(f"OpenCV Error during CLAHE matching for {key}: {e}")
-            except Exception as e:
-                print(f"Unexpected Error during CLAHE matching for {key}: {e}")
+            if key_best_confidence >= KEYWORD_EARLY_EXIT_CONFIDENCE:
+                break # Near-certain match; the remaining templates cannot change the outcome meaningfully
 
         # --- Result Merging and Selection ---
-        elapsed_time = time.time() - start_time
+        elapsed_time = time.perf_counter() - start_time
         self.performance_stats['total_detections'] += 1
         self.performance_stats['total_detection_time'] += elapsed_time
 
@@ -1444,8 +2066,7 @@ class DetectionModule:
         detection_type = "None" # For stats
 
         if not gray_results and not clahe_results:
-            if self.DEBUG_LEVEL > 1:
-                print(f"[Dual Method] No keywords found by either method. Time: {elapsed_time:.3f}s")
+            self._log(2, "[Dual Method] No keywords found by either method. Time: %.3fs", elapsed_time)
             self.last_detection_method = None
             self.last_detection_confidence = 0.0
             return None
@@ -1462,7 +2083,7 @@ class DetectionModule:
             detection_type = "Gray Only (High Conf)"
             self.performance_stats['gray_only_detections'] += 1
             if best_gray['is_inverted']: self.performance_stats['inverted_matches'] += 1
-            print(f"[Dual Method] Using high-confidence Gray result: {best_gray['template']} at {final_result_coords} (Conf: {best_gray['confidence']:.2f})")
+            self._log(1, "[Dual Method] Using high-confidence Gray result: %s at %s (Conf: %.2f)", best_gray['template'], final_result_coords, best_gray['confidence'])
 
         elif best_clahe and not best_gray and best_clahe['confidence'] >= DUAL_METHOD_HIGH_CONFIDENCE_THRESHOLD:
             final_result_coords = best_clahe['center']
@@ -1472,37 +2093,29 @@ class DetectionModule:
             detection_type = "CLAHE Only (High Conf)"
             self.performance_stats['clahe_only_detections'] += 1
             if best_clahe['is_inverted']: self.performance_stats['inverted_matches'] += 1
-            print(f"[Dual Method] Using high-confidence CLAHE result: {best_clahe['template']} at {final_result_coords} (Conf: {best_clahe['confidence']:.2f})")
+            self._log(1, "[Dual Method] Using high-confidence CLAHE result: %s at %s (Conf: %.2f)", best_clahe['template'], final_result_coords, best_clahe['confidence'])
 
         # Strategy 2: Find overlapping results if no high-confidence single result yet
         if final_result_coords is None:
             best_overlap_match = None
-            highest_overlap_confidence = 0
-
-            for gray_match in gray_results:
-                for clahe_match in clahe_results:
-                    # Check if templates match (or maybe just type?) - let's stick to same template for now
-                    if gray_match['template'] == clahe_match['template']:
-                        dist = math.sqrt((gray_match['center'][0] - clahe_match['center'][0])**2 +
-                                       (gray_match['center'][1] - clahe_match['center'][1])**2)
-
-                        if dist < MATCH_DISTANCE_THRESHOLD:
-                            # Use average confidence or max? Let's use average.
-                            combined_confidence = (gray_match['confidence'] + clahe_match['confidence']) / 2
-                            if combined_confidence > highest_overlap_confidence:
-                                highest_overlap_confidence = combined_confidence
-                                avg_center = (
-                                    (gray_match['center'][0] + clahe_match['center'][0]) // 2,
-                                    (gray_match['center'][1] + clahe_match['center'][1]) // 2
-                                )
-                                best_overlap_match = {
-                                    'template': gray_match['template'],
-                                    'center': avg_center,
-                                    'confidence': combined_confidence,
-                                    'dist': dist,
-                                    'is_inverted': gray_match['is_inverted'] or clahe_match['is_inverted'],
-                                    'type': gray_match['type'] # Type should be same
-                                }
+
+            # Same template, centers within MATCH_DISTANCE_THRESHOLD, highest average confidence
+            overlap = best_overlap_pair(gray_results, clahe_results, MATCH_DISTANCE_THRESHOLD)
+            if overlap is not None:
+                gray_index, clahe_index, dist = overlap
+                gray_match, clahe_match = gray_results[gray_index], clahe_results[clahe_index]
+                avg_center = (
+                    (gray_match['center'][0] + clahe_match['center'][0]) // 2,
+                    (gray_match['center'][1] + clahe_match['center'][1]) // 2
+                )
+                best_overlap_match = {
+                    'template': gray_match['template'],
+                    'center': avg_center,
+                    'confidence': (gray_match['confidence'] + clahe_match['confidence']) / 2,
+                    'dist': dist,
+                    'is_inverted': gray_match['is_inverted'] or clahe_match['is_inverted'],
+                    'type': gray_match['type'] # Type should be same
+                }
 
             if best_overlap_match:
                 final_result_coords = best_overlap_match['center']
@@ -1512,67 +2125,72 @@ class DetectionModule:
                 detection_type = "Dual Overlap"
                 self.performance_stats['dual_method_detections'] += 1
                 if best_overlap_match['is_inverted']: self.performance_stats['inverted_matches'] += 1
-                print(f"[Dual Method] Using overlapping result: {best_overlap_match['template']} at {final_result_coords} (Conf: {best_overlap_match['confidence']:.2f}, Dist: {best_overlap_match['dist']:.1f}px)")
+                self._log(1, "[Dual Method] Using overlapping result: %s at %s (Conf: %.2f, Dist: %.1fpx)", best_overlap_match['template'], final_result_coords, best_overlap_match['confidence'], best_overlap_match['dist'])
 
         # Strategy 3: Fallback to best single result if no overlap found
         if final_result_coords is None:
-            all_results = gray_results + clahe_results
-            if all_results:
-                best_overall = max(all_results, key=lambda x: x['confidence'])
+            if best_gray or best_clahe:
+                # 沿用策略1的最佳結果，並記住來源（平手時與原本的 max() 一樣優先灰度）
+                from_gray = best_clahe is None or (best_gray is not None and best_gray['confidence'] >= best_clahe['confidence'])
+                best_overall = best_gray if from_gray else best_clahe
                 # Use a slightly lower threshold for fallback
                 if best_overall['confidence'] >= DUAL_METHOD_FALLBACK_CONFIDENCE_THRESHOLD:
                     final_result_coords = best_overall['center']
                     final_template_key = best_overall['template'] # 新增
-                    method_name = "Gray Fallback" if best_overall in gray_results else "CLAHE Fallback"
+                    method_name = "Gray Fallback" if from_gray else "CLAHE Fallback"
                     method_name += " (Inv)" if best_overall['is_inverted'] else ""
                     self.last_detection_method = method_name
                     self.last_detection_confidence = best_overall['confidence']
                     detection_type = "Fallback"
                     self.performance_stats['fallback_detections'] += 1 # Track fallbacks
-                    if best_overall in gray_results: self.performance_stats['gray_only_detections'] += 1
+                    if from_gray: self.performance_stats['gray_only_detections'] += 1
                     else: self.performance_stats['clahe_only_detections'] += 1
                     if best_overall['is_inverted']: self.performance_stats['inverted_matches'] += 1
-                    print(f"[Dual Method] Using fallback result ({method_name}): {best_overall['template']} at {final_result_coords} (Conf: {best_overall['confidence']:.2f})")
+                    self._log(1, "[Dual Method] Using fallback result (%s): %s at %s (Conf: %.2f)", method_name, best_overall['template'], final_result_coords, best_overall['confidence'])
 
         # --- Final Result Handling & Debug ---
         if final_result_coords:
             self.performance_stats['successful_detections'] += 1
+            template_hits[final_template_key] += 1
             if self.DEBUG_LEVEL >= 3:
                 # --- Visual Debugging ---
                 try:
                     # Create side-by-side comparison of gray and clahe
-                    debug_processed_path = os.path.join(DEBUG_SCREENSHOT_DIR, f"dual_processed_{int(time.time())}.png")
-                    # Ensure images have same height for hstack
+                    debug_processed_path = os.path.join(DEBUG_SCREENSHOT_DIR, f"dual_processed_{time.time_ns()}.png")
+                    # Ensure images have same height side by side
                     h_gray_img, w_gray_img = img_gray.shape[:2]
                     h_clahe_img, w_clahe_img = img_clahe.shape[:2]
                     max_h = max(h_gray_img, h_clahe_img)
-                    # Resize if needed (convert to BGR for stacking color images if necessary)
-                    img_gray_bgr = cv2.cvtColor(cv2.resize(img_gray, (int(w_gray_img * max_h / h_gray_img), max_h)), cv2.COLOR_GRAY2BGR)
-                    img_clahe_bgr = cv2.cvtColor(cv2.resize(img_clahe, (int(w_clahe_img * max_h / h_clahe_img), max_h)), cv2.COLOR_GRAY2BGR)
-                    debug_img_processed = np.hstack([img_gray_bgr, img_clahe_bgr])
-                    cv2.imwrite(debug_processed_path, debug_img_processed)
+                    w_gray_out = int(w_gray_img * max_h / h_gray_img)
+                    w_clahe_out = int(w_clahe_img * max_h / h_clahe_img)
+                    # One BGR canvas; each half is converted straight into its slice (no hstack copy)
+                    debug_img_processed = np.empty((max_h, w_gray_out + w_clahe_out, 3), dtype=np.uint8)
+                    for panel, panel_x, panel_w in ((img_gray, 0, w_gray_out), (img_clahe, w_gray_out, w_clahe_out)):
+                        if panel.shape[:2] != (max_h, panel_w): # Resize only if needed
+                            panel = cv2.resize(panel, (panel_w, max_h))
+                        cv2.cvtColor(panel, cv2.COLOR_GRAY2BGR, dst=debug_img_processed[:, panel_x:panel_x + panel_w])
+                    save_debug_image(debug_processed_path, debug_img_processed)
 
                     # Draw results on original BGR image
                     result_img = img_bgr.copy()
                     # Draw relative centers for visualization within the region
-                    for result in gray_results:
-                        rel_x = result['center'][0] - region_x
-                        rel_y = result['center'][1] - region_y
-                        cv2.circle(result_img, (rel_x, rel_y), 5, (0, 0, 255), -1) # Red = Gray
-                    for result in clahe_results:
-                        rel_x = result['center'][0] - region_x
-                        rel_y = result['center'][1] - region_y
-                        cv2.circle(result_img, (rel_x, rel_y), 5, (0, 255, 0), -1) # Green = CLAHE
+                    # Red = Gray, Green = CLAHE; offsets subtracted once per method
+                    for method_results, color in ((gray_results, (0, 0, 255)), (clahe_results, (0, 255, 0))):
+                        if not method_results:
+                            continue
+                        rel_centers = np.array([result['center'] for result in method_results], dtype=np.int32) - (region_x, region_y)
+                        for rel_x, rel_y in rel_centers.tolist():
+                            cv2.circle(result_img, (rel_x, rel_y), 5, color, -1)
 
                     # Mark final chosen point (relative)
                     final_rel_x = final_result_coords[0] - region_x
                     final_rel_y = final_result_coords[1] - region_y
                     cv2.circle(result_img, (final_rel_x, final_rel_y), 8, (255, 0, 0), 2) # Blue circle = Final
 
-                    debug_result_path = os.path.join(DEBUG_SCREENSHOT_DIR, f"dual_result_{int(time.time())}.png")
-                    cv2.imwrite(debug_result_path, result_img)
-                    print(f"[Dual Method Debug] Saved processed image to {debug_processed_path}")
-                    print(f"[Dual Method Debug] Saved result image to {debug_result_path}")
+                    debug_result_path = os.path.join(DEBUG_SCREENSHOT_DIR, f"dual_result_{time.time_ns()}.png")
+                    save_debug_image(debug_result_path, result_img)  # Both images are freshly allocated, no copy needed
+                    print(f"[Dual Method Debug] Queued processed image for {debug_processed_path}")
+                    print(f"[Dual Method Debug] Queued result image for {debug_result_path}")
                 except Exception as debug_e:
                     print(f"Error during visual debugging image generation: {debug_e}")
                 # --- End Visual Debugging ---
@@ -1580,8 +2198,7 @@ class DetectionModule:
             # Return absolute coordinates and the matched key
             return (final_result_coords, final_template_key)
         else:
-            if self.DEBUG_LEVEL > 0: # Log failure only if debug level > 0
-                 print(f"[Dual Method] No sufficiently confident match found. Time: {elapsed_time:.3f}s")
+            self._log(1, "[Dual Method] No sufficiently confident match found. Time: %.3fs", elapsed_time)
             self.last_detection_method = None
             self.last_detection_confidence = 0.0
             return None # Return None for both coords and key on failure
@@ -1665,19 +2282,20 @@ class DetectionModule:
     
     def calculate_image_difference(self, img1, img2) -> float:
         """
-        Calculate the difference between two PIL Images.
+        Calculate the difference between two images (uint8 ndarrays or PIL Images).
         Returns a value between 0 (identical) and 1 (completely different).
         """
         try:
-            arr1 = np.array(img1)
-            arr2 = np.array(img2)
+            arr1 = np.asarray(img1)
+            arr2 = np.asarray(img2)
             
             # Ensure same dimensions
             if arr1.shape != arr2.shape:
                 return 1.0  # Consider different sizes as completely different
             
-            # Calculate mean absolute difference
-            diff = np.mean(np.abs(arr1.astype(float) - arr2.astype(float))) / 255.0
+            # Mean absolute difference on uint8 (SIMD absdiff, no float copies); averaged over channels
+            channels = 1 if arr1.ndim == 2 else arr1.shape[2]
+            diff = sum(cv2.mean(cv2.absdiff(arr1, arr2))[:channels]) / channels / 255.0
             return diff
         except Exception as e:
             print(f"Error calculating image difference: {e}")
@@ -1688,27 +2306,31 @@ class DetectionModule:
         Wait for UI to become stable before detection.
         Returns True if UI is stable, False if timeout occurred.
         """
-        last_screenshot = None
+        last_small = None
         stable_start_time = None
-        start_time = time.time()
+        start_time = time.monotonic()
+        step = UI_STABILITY_DOWNSAMPLE
         
-        while time.time() - start_time < self.ui_stability_timeout:
+        while time.monotonic() - start_time < self.ui_stability_timeout:
             try:
-                current_screenshot = pyautogui.screenshot(region=region)
+                # Strided grayscale sample: a scalar "did anything change" needs only a fraction of the pixels
+                current_small = np.ascontiguousarray(self.capture_frame(region)[::step, ::step])
                 
-                if last_screenshot is not None:
-                    diff = self.calculate_image_difference(last_screenshot, current_screenshot)
+                if last_small is not None and last_small.shape == current_small.shape:
+                    diff = cv2.absdiff(last_small, current_small)
+                    cv2.threshold(diff, UI_STABILITY_PIXEL_TOLERANCE, 255, cv2.THRESH_BINARY, dst=diff)
+                    changed_fraction = cv2.countNonZero(diff) / diff.size
                     
-                    if diff < 0.02:  # Less than 1% difference indicates stability (tighter for games)
+                    if changed_fraction < UI_STABILITY_CHANGE_THRESHOLD:  # Under 2% of sampled pixels changed indicates stability
                         if stable_start_time is None:
-                            stable_start_time = time.time()
-                        elif time.time() - stable_start_time >= self.ui_stability_duration:
+                            stable_start_time = time.monotonic()
+                        elif time.monotonic() - stable_start_time >= self.ui_stability_duration:
                             self.performance_stats['stability_waits'] += 1
                             return True  # UI has been stable for required duration
                     else:
                         stable_start_time = None  # Reset stability timer
                 
-                last_screenshot = current_screenshot
+                last_small = current_small
                 time.sleep(0.05)  # Short interval between checks
                 
             except Exception as e:
@@ -1728,61 +2350,69 @@ class DetectionModule:
         if len(coords_list) < 2:
             return True
         
-        first_coord = coords_list[0]
-        for coord in coords_list[1:]:
-            if (abs(coord[0] - first_coord[0]) > tolerance or 
-                abs(coord[1] - first_coord[1]) > tolerance):
-                return False
-        return True
+        if len(coords_list) == 2:
+            # 最常見的兩次驗證：純量比較即可，不值得進入 NumPy
+            (x1, y1), (x2, y2) = coords_list
+            return abs(x2 - x1) <= tolerance and abs(y2 - y1) <= tolerance
+        
+        # 其餘情況：一次 NumPy 比較所有座標與第一個座標的最大偏差
+        coords = np.asarray(coords_list, dtype=np.float64)
+        return bool((np.abs(coords[1:] - coords[0]) <= tolerance).all())
 
     def verify_detection_result(self, detection_method, *args, **kwargs):
         """
         Verify detection result consistency through multiple attempts.
+        Stops as soon as two attempts agree, or once too few attempts remain to get two valid results.
         Returns the verified result or None if verification fails.
         """
-        results = []
+        valid_results = []
         
         for i in range(self.verification_attempts):
             try:
                 result = detection_method(*args, **kwargs)
-                results.append(result)
-                
-                if i < self.verification_attempts - 1:  # Don't wait after last attempt
-                    time.sleep(0.05)  # Short interval between verification attempts
-                    
             except Exception as e:
                 print(f"Error during verification attempt {i+1}: {e}")
-                results.append(None)
-        
-        # Analyze results for consistency
-        valid_results = [r for r in results if r is not None]
-        
-        if len(valid_results) >= 2:  # Need at least 2 successful detections
-            # Check if results are coordinate-based or bubble-based
-            if all(isinstance(r, tuple) and len(r) == 2 for r in valid_results):
-                # Check if these are coordinate tuples or (coord, key) tuples
-                if all(isinstance(r[0], (int, float)) for r in valid_results):
-                    # Simple coordinate tuples (x, y)
-                    if self.coordinates_are_similar(valid_results):
-                        return valid_results[0]  # Return first valid result
-                else:
-                    # These are (coordinates, key) tuples from keyword detection
-                    coords_only = [r[0] for r in valid_results if r[0] is not None]
-                    if len(coords_only) >= 2 and self.coordinates_are_similar(coords_only):
-                        return valid_results[0]  # Return first valid result
-            elif all(isinstance(r, list) for r in valid_results):
-                # Bubble list results - check if similar bubbles detected
-                if len(valid_results[0]) == len(valid_results[1]):  # Same number of bubbles
-                    return valid_results[0]  # Return first valid result
-            else:
-                # Other result types - just check for consistency
-                if all(r == valid_results[0] for r in valid_results[1:]):
-                    return valid_results[0]
+                result = None
+            if result is not None:
+                valid_results.append(result)
+                if len(valid_results) >= 2:
+                    verified = self._consistent_result(valid_results)
+                    if verified is not None:
+                        return verified
+            
+            remaining_attempts = self.verification_attempts - i - 1
+            if remaining_attempts == 0 or len(valid_results) + remaining_attempts < 2:
+                break  # Need at least 2 successful detections; no more waiting if that is out of reach
+            time.sleep(0.05)  # Short interval between verification attempts
         
         # Verification failed
         self.performance_stats['verification_failures'] += 1
         return None
 
+    def _consistent_result(self, valid_results: List[Any]) -> Optional[Any]:
+        """Return the first of two or more valid detection results if they agree, else None."""
+        # Check if results are coordinate-based or bubble-based
+        if all(isinstance(r, tuple) and len(r) == 2 for r in valid_results):
+            # Check if these are coordinate tuples or (coord, key) tuples
+            if all(isinstance(r[0], (int, float)) for r in valid_results):
+                # Simple coordinate tuples (x, y)
+                if self.coordinates_are_similar(valid_results):
+                    return valid_results[0]  # Return first valid result
+            else:
+                # These are (coordinates, key) tuples from keyword detection
+                coords_only = [r[0] for r in valid_results if r[0] is not None]
+                if len(coords_only) >= 2 and self.coordinates_are_similar(coords_only):
+                    return valid_results[0]  # Return first valid result
+        elif all(isinstance(r, list) for r in valid_results):
+            # Bubble list results - check if similar bubbles detected
+            if len(valid_results[0]) == len(valid_results[1]):  # Same number of bubbles
+                return valid_results[0]  # Return first valid result
+        else:
+            # Other result types - just check for consistency
+            if all(r == valid_results[0] for r in valid_results[1:]):
+                return valid_results[0]
+        return None
+
     def adaptive_threshold_detection(self, template_key: str, region: Tuple[int, int, int, int]) -> Optional[Tuple[int, int]]:
         """
         Perform adaptive threshold detection to eliminate boundary oscillation.
@@ -1790,11 +2420,19 @@ class DetectionModule:
         """
         confidence_levels = [0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]
         stable_results = []
+
+        # One capture and one matchTemplate; every confidence level thresholds the same score map
+        try:
+            score_map = self._template_score_map(template_key, region)
+        except Exception as e:
+            print(f"Error in adaptive threshold detection: {e}")
+            return None
+        if score_map is None:
+            return None
         
         for confidence in confidence_levels:
             try:
-                # Use existing dual method with custom confidence
-                result = self._find_template_with_confidence(template_key, region, confidence)
+                result = self._find_template_with_confidence(template_key, region, confidence, score_map=score_map)
                 if result:
                     stable_results.append((result, confidence))
             except Exception as e:
@@ -1811,22 +2449,47 @@ class DetectionModule:
         
         return None
 
-    def _find_template_with_confidence(self, template_key: str, region: Tuple[int, int, int, int], confidence: float) -> Optional[Tuple[int, int]]:
+    def _template_score_map(self, template_key: str, region: Tuple[int, int, int, int],
+                            frame_gray: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, int, int]]:
         """
-        Helper method to find template with specific confidence level.
-        Returns center coordinates or None.
+        TM_CCOEFF_NORMED score map of a grayscale template over region (captured unless frame_gray is given).
+        Returns (scores, template_width, template_height), or None if the template is unavailable.
         """
         template_path = self.templates.get(template_key)
-        if not template_path or not os.path.exists(template_path):
+        if not template_path or template_path in self._missing_template_paths:
             return None
-        
+        needle = load_template(template_path, grayscale=True)
+        if needle is None:
+            return None
+        if frame_gray is None:
+            frame_gray = self.capture_frame(region)
+        needle_h, needle_w = needle.shape[:2]
+        if frame_gray.shape[0] < needle_h or frame_gray.shape[1] < needle_w:
+            return None
+        return cv2.matchTemplate(frame_gray, needle, cv2.TM_CCOEFF_NORMED), needle_w, needle_h
+
+    def _find_template_with_confidence(self, template_key: str, region: Tuple[int, int, int, int], confidence: float,
+                                       score_map: Optional[Tuple[np.ndarray, int, int]] = None) -> Optional[Tuple[int, int]]:
+        """
+        Helper method to find template with specific confidence level.
+        Like locateAllOnScreen's first box: the first position in row-major order scoring above confidence.
+        score_map (from _template_score_map) lets callers threshold one match at several levels.
+        Returns center coordinates or None.
+        """
         try:
-            matches = pyautogui.locateAllOnScreen(template_path, region=region, confidence=confidence, grayscale=True)
-            if matches:
-                for box in matches:
-                    center_x = box.left + box.width // 2
-                    center_y = box.top + box.height // 2
-                    return (center_x, center_y)
+            if score_map is None:
+                score_map = self._template_score_map(template_key, region)
+            if score_map is None:
+                return None
+            scores, needle_w, needle_h = score_map
+            above = (scores > confidence).ravel()
+            first = int(above.argmax()) # argmax of a bool array is the first True
+            if not above[first]:
+                return None
+            match_y, match_x = divmod(first, scores.shape[1])
+            region = region if region is not None else self.region # capture_frame's default
+            left, top = (int(region[0]), int(region[1])) if region is not None else (0, 0)
+            return (left + match_x + needle_w // 2, top + match_y + needle_h // 2)
         except Exception as e:
             print(f"Error in template matching with confidence {confidence}: {e}")
         
@@ -1869,45 +2532,38 @@ class DetectionModule:
         try:
             # 檢查5分鐘強制喚醒機制
             if self.eco_mode_start_time is not None:
-                elapsed_time = time.time() - self.eco_mode_start_time
+                elapsed_time = time.monotonic() - self.eco_mode_start_time
                 if elapsed_time >= self.eco_mode_wakeup_interval:
-                    print(f"經濟模式：已運行{elapsed_time:.1f}秒，觸發5分鐘強制喚醒機制")
+                    self._log(1, "經濟模式：已運行%.1f秒，觸發5分鐘強制喚醒機制", elapsed_time)
                     return True
             
             # 只在聊天室狀態下執行
             if not self._find_template('chat_room', confidence=self.state_confidence):
-                print("經濟模式：不在聊天室狀態，跳過檢測")
+                self._log(1, "經濟模式：不在聊天室狀態，跳過檢測")
                 return False
             
-            # 截取固定區域並轉換為numpy array
-            current_screenshot = pyautogui.screenshot(region=self.eco_mode_region)
-            current_img = np.array(current_screenshot)
-            current_img = cv2.cvtColor(current_img, cv2.COLOR_RGB2BGR)
-            
-            # 轉換為灰度圖像以提高比較效率
-            current_gray = cv2.cvtColor(current_img, cv2.COLOR_BGR2GRAY)
+            # 截取固定區域（直接取得灰度圖像），再以 INTER_AREA 縮小後比較：
+            # 只需判斷「是否有變化」，區域平均保留細字變化，頻寬降為 1/16
+            scale = 1.0 / ECO_MODE_DOWNSAMPLE
+            current_small = cv2.resize(self.capture_frame(self.eco_mode_region), None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
             
-            if self.last_eco_screenshot is None:
-                self.last_eco_screenshot = current_gray
-                print("經濟模式：初始化基準截圖")
+            if self.last_eco_screenshot is None or self.last_eco_screenshot.shape != current_small.shape:
+                self.last_eco_screenshot = current_small
+                self._log(1, "經濟模式：初始化基準截圖")
                 return False
             
-            # 計算結構相似性指數(SSIM)或直接使用像素差異
-            # 使用簡單的像素差異比較（與腳本風格一致）
-            diff = cv2.absdiff(self.last_eco_screenshot, current_gray)
-            non_zero_count = cv2.countNonZero(diff)
-            total_pixels = diff.shape[0] * diff.shape[1]
-            change_percentage = (non_zero_count / total_pixels) * 100
+            # 使用簡單的像素差異比較，忽略小於雜訊閾值的差異
+            diff = cv2.absdiff(self.last_eco_screenshot, current_small)
+            cv2.threshold(diff, ECO_MODE_NOISE_THRESHOLD, 255, cv2.THRESH_BINARY, dst=diff)
+            change_percentage = cv2.countNonZero(diff) / diff.size * 100
             
-            # 設定變化閾值（可調整）
-            change_threshold = 2.0  # 2%的像素變化
-            
-            if change_percentage > change_threshold:
-                print(f"經濟模式：檢測到顯著變化 {change_percentage:.2f}%，退出經濟模式")
-                self.last_eco_screenshot = current_gray  # 更新基準
+            if change_percentage > ECO_MODE_CHANGE_THRESHOLD:
+                self._log(1, "經濟模式：檢測到顯著變化 %.2f%%，退出經濟模式", change_percentage)
+                self.last_eco_screenshot = current_small  # 更新基準
                 return True
             
-            print(f"經濟模式：無顯著變化 {change_percentage:.2f}%，繼續監控")
+            self._log(1, "經濟模式：無顯著變化 %.2f%%，繼續監控", change_percentage)
             return False
             
         except Exception as e:
@@ -1925,20 +2581,49 @@ class DetectionModule:
         # print(f"Calculated avatar coordinates using TL {bubble_tl_coords}: ({int(avatar_x)}, {int(avatar_y)})") # Reduce noise
         return (int(avatar_x), int(avatar_y))
 
+    def invalidate_ui_state(self) -> None:
+        """Drop the cached UI state; called after every click/key press that may change the screen."""
+        self._ui_state_cache = None
+
     def get_current_ui_state(self) -> str:
-        """Determine the current UI state based on visible elements."""
-        # Check in order of specificity or likelihood
-        if self._find_template('profile_name_page', confidence=self.state_confidence):
-            return 'user_details'
-        if self._find_template('profile_page', confidence=self.state_confidence):
-            return 'profile_card'
-        # Add checks for world/private chat later
-        if self._find_template('world_chat', confidence=self.state_confidence): # Example
-             return 'world_chat'
-        if self._find_template('private_chat', confidence=self.state_confidence): # Example
-             return 'private_chat'
-        if self._find_template('chat_room', confidence=self.state_confidence):
-            return 'chat_room' # General chat room if others aren't found
+        """
+        Determine the current UI state based on visible elements.
+        Results are reused for UI_STATE_CACHE_TTL seconds unless invalidate_ui_state() was called.
+        """
+        now = time.monotonic()
+        cache = self._ui_state_cache
+        if cache is not None and now - cache[0] < UI_STATE_CACHE_TTL:
+            return cache[1]
+        state = self._detect_ui_state()
+        self._ui_state_cache = (now, state)
+        return state
+
+    def _detect_ui_state(self) -> str:
+        """
+        Run the template checks behind get_current_ui_state on ONE capture of the detection region:
+        the frame is grabbed (and converted to grayscale) once and every state template is matched against it.
+        """
+        region = self.region
+        if region is None:
+            screen_w, screen_h = pyautogui.size()
+            region = (0, 0, screen_w, screen_h)
+        try:
+            frame_bgr = self.capture_frame(region, grayscale=False)
+        except Exception as e:
+            print(f"Error capturing region {region} for UI state detection: {e}")
+            return 'unknown'
+        frame_gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+
+        # Check in order of specificity or likelihood; chat_room is the general chat room if others aren't found
+        for template_key, state in (('profile_name_page', 'user_details'),
+                                    ('profile_page', 'profile_card'),
+                                    ('world_chat', 'world_chat'),
+                                    ('private_chat', 'private_chat'),
+                                    ('chat_room', 'chat_room')):
+            boxes = self._find_template_raw_in_image(frame_bgr, template_key, region,
+                                                     confidence=self.state_confidence, frame_gray=frame_gray)
+            if len(boxes):
+                return state
 
         return 'unknown'
 
@@ -1953,6 +2638,11 @@ class InteractionModule:
         self.default_input_coords = input_coords
         self.input_template_key = input_template_key
         self.send_button_key = send_button_key
+        # Resolve the platform clipboard backend once instead of going through pyperclip's lazy wrappers
+        self._clipboard_copy, self._clipboard_paste = pyperclip.determine_clipboard()
+        # Input box position found by template (coords, monotonic expiry); the box does not move between sends
+        self._cached_input_coords: Optional[Tuple[int, int]] = None
+        self._cached_input_expires = 0.0
         print("InteractionModule initialized.")
 
     def click_at(self, x: int, y: int, button: str = 'left', clicks: int = 1, interval: float = 0.1, duration: float = 0.1):
@@ -1961,7 +2651,6 @@ class InteractionModule:
         if not is_click_position_safe(x, y):
             safe_x_min, safe_y_min, safe_x_max, safe_y_max = calculate_safe_click_region()
             scale_factor = get_windows_dpi_scale()
-            scale_factor = get_windows_dpi_scale()
             print(f"\n⚠️  SAFETY VIOLATION: Click position ({x}, {y}) is outside safe game window boundary!")
             print(f"Safe area: ({safe_x_min}, {safe_y_min}) to ({safe_x_max}, {safe_y_max})")
             print(f"Config window (100%): ({config.GAME_WINDOW_X}, {config.GAME_WINDOW_Y}) size ({config.GAME_WINDOW_WIDTH}x{config.GAME_WINDOW_HEIGHT})")
@@ -1973,9 +2662,11 @@ class InteractionModule:
         try:
             scale_factor = get_windows_dpi_scale()
             scaling_info = f" [DPI {scale_factor:.2f}]" if scale_factor != 1.0 else ""
-            print(f"Moving to and clicking at: ({x}, {y}) [SAFE]{scaling_info}, button: {button}, clicks: {clicks}")
-            pyautogui.moveTo(x, y, duration=duration)
-            pyautogui.click(button=button, clicks=clicks, interval=interval)
+            self.detector._log(2, "Moving to and clicking at: (%s, %s) [SAFE]%s, button: %s, clicks: %s", x, y, scaling_info, button, clicks)
+            self.detector.invalidate_ui_state()
+            pyautogui.moveTo(x, y, duration=duration)  # Keeps pyautogui.PAUSE so the pointer settles before the click
+            # _pause=False: skip pyautogui's implicit 0.1s PAUSE, the explicit sleep below already paces the UI
+            pyautogui.click(button=button, clicks=clicks, interval=interval, _pause=False)
             time.sleep(0.1)
             return True  # 成功點擊
         except Exception as e:
@@ -1985,9 +2676,10 @@ class InteractionModule:
     def press_key(self, key: str, presses: int = 1, interval: float = 0.1):
         """Press a specific key."""
         try:
-            print(f"Pressing key: {key} ({presses} times)")
+            self.detector._log(2, "Pressing key: %s (%s times)", key, presses)
+            self.detector.invalidate_ui_state()
             for _ in range(presses):
-                pyautogui.press(key)
+                pyautogui.press(key, _pause=False)  # interval below is the only pacing
                 time.sleep(interval)
         except Exception as e:
             print(f"Error pressing key '{key}': {e}")
@@ -1995,61 +2687,89 @@ class InteractionModule:
     def hotkey(self, *args):
         """Press a key combination (e.g., 'ctrl', 'c')."""
         try:
-            print(f"Pressing hotkey: {args}")
-            pyautogui.hotkey(*args)
-            time.sleep(0.1) # Short pause after hotkey
+            self.detector._log(2, "Pressing hotkey: %s", args)
+            self.detector.invalidate_ui_state()
+            pyautogui.hotkey(*args, _pause=False)
+            time.sleep(0.1) # Short pause after hotkey (replaces pyautogui's implicit PAUSE)
         except Exception as e:
             print(f"Error pressing hotkey {args}: {e}")
 
+    def _wait_until(self, predicate, timeout: float, tick: float = ADAPTIVE_WAIT_TICK):
+        """
+        Poll predicate every tick seconds until it returns a truthy value or timeout elapses.
+        Replaces fixed sleeps before a check: returns as soon as the UI is ready, never later than
+        the old sleep did. predicate is always evaluated at least once; its last value is returned.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            result = predicate()
+            if result or time.perf_counter() >= deadline:
+                return result
+            time.sleep(tick)
+
+    def _wait_for_template(self, template_key: str, confidence: float, timeout: float,
+                           tick: float = ADAPTIVE_WAIT_TICK) -> List[Tuple[int, int]]:
+        """Poll the detector for template_key until it appears or timeout elapses. Returns its center coordinates (may be empty)."""
+        return self._wait_until(lambda: self.detector._find_template(template_key, confidence=confidence), timeout, tick)
+
     def get_clipboard(self) -> Optional[str]:
         """Get text from clipboard."""
         try:
-            return pyperclip.paste()
+            return self._clipboard_paste()
         except Exception as e:
             print(f"Error reading clipboard: {e}")
             return None
 
-    def set_clipboard(self, text: str):
-        """Set clipboard text."""
+    def set_clipboard(self, text: str, sanitize: bool = False):
+        """
+        Set clipboard text. With sanitize=True (outgoing chat text) the text is NFC-normalized and
+        unencodable characters such as lone surrogates are replaced; otherwise it is written verbatim,
+        so a restored user clipboard comes back unchanged.
+        """
         try:
-            pyperclip.copy(text)
+            if sanitize:
+                text = unicodedata.normalize('NFC', text).encode('utf-8', errors='replace').decode('utf-8')
+            self._clipboard_copy(text)
         except Exception as e:
             print(f"Error writing to clipboard: {e}")
 
+    def _copied_clipboard_text(self) -> Optional[str]:
+        """Clipboard text once a copy has replaced the ___MCP_CLEAR___ sentinel, else None (a _wait_until predicate)."""
+        text = self.get_clipboard()
+        return text if text != "___MCP_CLEAR___" else None
+
     def copy_text_at(self, coords: Tuple[int, int]) -> Optional[str]:
         """Attempt to copy text after clicking at given coordinates."""
         print(f"Attempting to copy text at {coords}...")
         original_clipboard = self.get_clipboard() or ""
-        self.set_clipboard("___MCP_CLEAR___")
-        time.sleep(0.1)
+        self.set_clipboard("___MCP_CLEAR___")  # Clipboard writes are synchronous, no need to read it back
 
         self.click_at(coords[0], coords[1])
-        time.sleep(0.1) # Wait for menu/reaction
 
         copied = False
-        # Try finding "Copy" menu item first
-        copy_item_locations = self.detector._find_template('copy_menu_item', confidence=0.7) # Use detector
+        copied_text = None
+        # Try finding "Copy" menu item first (polled until the menu appears)
+        copy_item_locations = self._wait_for_template('copy_menu_item', confidence=0.7, timeout=0.1) # Use detector
         if copy_item_locations:
             copy_coords = copy_item_locations[0]
             self.click_at(copy_coords[0], copy_coords[1])
             print("Clicked 'Copy' menu item.")
-            time.sleep(0.15)
+            copied_text = self._wait_until(self._copied_clipboard_text, timeout=0.15)
             copied = True
         else:
             print("'Copy' menu item not found. Attempting Ctrl+C.")
             try:
                 self.hotkey('ctrl', 'c')
-                time.sleep(0.1)
+                copied_text = self._wait_until(self._copied_clipboard_text, timeout=0.1)
                 print("Simulated Ctrl+C.")
                 copied = True
             except Exception as e_ctrlc:
                  print(f"Failed to simulate Ctrl+C: {e_ctrlc}")
                  copied = False
 
-        copied_text = self.get_clipboard()
         self.set_clipboard(original_clipboard) # Restore clipboard
 
-        if copied and copied_text and copied_text != "___MCP_CLEAR___":
+        if copied and copied_text:
             print(f"Successfully copied text, length: {len(copied_text)}")
             # 添加編碼安全處理
             try:
@@ -2064,7 +2784,7 @@ class InteractionModule:
 
     def retrieve_sender_name_interaction(self,
                                          initial_avatar_coords: Tuple[int, int],
-                                         bubble_snapshot: Any, # PIL Image object
+                                         bubble_snapshot: Optional[np.ndarray], # BGR ndarray
                                          search_area: Optional[Tuple[int, int, int, int]]) -> Optional[str]:
         """
         Perform the sequence of actions to copy sender name, *without* cleanup.
@@ -2073,8 +2793,7 @@ class InteractionModule:
         """
         print(f"Attempting interaction to get username, initial avatar guess: {initial_avatar_coords}...")
         original_clipboard = self.get_clipboard() or ""
-        self.set_clipboard("___MCP_CLEAR___")
-        time.sleep(0.1)
+        self.set_clipboard("___MCP_CLEAR___")  # Clipboard writes are synchronous, no need to read it back
         sender_name = None
         profile_page_found = False
         current_avatar_coords = initial_avatar_coords
@@ -2089,7 +2808,7 @@ class InteractionModule:
                     print("Error: Cannot retry re-location, bubble snapshot is missing.")
                     break # Cannot retry without snapshot
 
-                new_bubble_box_retry = pyautogui.locateOnScreen(bubble_snapshot, region=search_area, confidence=BUBBLE_RELOCATE_CONFIDENCE)
+                new_bubble_box_retry = self.detector.locate_snapshot(bubble_snapshot, search_area, confidence=BUBBLE_RELOCATE_CONFIDENCE)
                 if new_bubble_box_retry:
                     new_tl_x_retry, new_tl_y_retry = new_bubble_box_retry.left, new_bubble_box_retry.top
                     print(f"Successfully re-located bubble snapshot for retry at: ({new_tl_x_retry}, {new_tl_y_retry})")
@@ -2103,14 +2822,15 @@ class InteractionModule:
             # --- Click Avatar ---
             try:
                 self.click_at(current_avatar_coords[0], current_avatar_coords[1])
-                time.sleep(0.15) # Slightly longer wait after click to allow UI to update
             except Exception as click_err:
                 print(f"Error clicking avatar at {current_avatar_coords} on attempt {attempt + 1}: {click_err}")
                 time.sleep(0.3) # Wait a bit longer after a click error before retrying
                 continue # Go to next attempt
 
             # --- Check for Profile Page ---
-            if self.detector._find_template('profile_page', confidence=self.detector.state_confidence):
+            # Poll for the page over the old post-click wait plus the pre-retry wait (0.15 + 0.3 s),
+            # so a slow profile card is still caught before clicking the avatar again
+            if self._wait_for_template('profile_page', confidence=self.detector.state_confidence, timeout=0.45):
                 print("Profile page verified.")
                 profile_page_found = True
                 break # Success, exit retry loop
@@ -2119,7 +2839,6 @@ class InteractionModule:
                 # Optional: Press ESC once to close potential wrong menus before retrying?
                 # self.press_key('esc')
                 # time.sleep(0.1)
-                time.sleep(0.3) # Wait before next attempt
 
         # --- If Profile Page was found, proceed ---
         if profile_page_found:
@@ -2131,20 +2850,18 @@ class InteractionModule:
                     return None # Fail early if critical step missing
                 self.click_at(profile_option_locations[0][0], profile_option_locations[0][1])
                 print("Clicked user details option.")
-                time.sleep(0.1) # Wait for user details window
 
-                # 3. Find and click "Copy Name" button
-                copy_name_locations = self.detector._find_template('copy_name_button', confidence=0.7)
+                # 3. Find and click "Copy Name" button (polled until the user details window shows it)
+                copy_name_locations = self._wait_for_template('copy_name_button', confidence=0.7, timeout=0.1)
                 if not copy_name_locations:
                     print("Error: 'Copy Name' button not found in user details.")
                     return None # Fail early
                 self.click_at(copy_name_locations[0][0], copy_name_locations[0][1])
                 print("Clicked 'Copy Name' button.")
-                time.sleep(0.1)
 
-                # 4. Get name from clipboard
-                copied_name = self.get_clipboard()
-                if copied_name and copied_name != "___MCP_CLEAR___":
+                # 4. Get name from clipboard (polled until the copy lands)
+                copied_name = self._wait_until(self._copied_clipboard_text, timeout=0.1)
+                if copied_name:
                     print(f"Successfully copied username: {copied_name}")
                     sender_name = copied_name.strip()
                 else:
@@ -2172,12 +2889,17 @@ class InteractionModule:
             print("Error: Response content is empty, cannot send.")
             return False
 
-        # Find input box coordinates
+        # Find input box coordinates (reuse a recent template hit instead of rescanning every send)
         input_coords = self.default_input_coords # Fallback
-        if self.input_template_key and self.detector.templates.get(self.input_template_key):
+        if self._cached_input_coords is not None and time.monotonic() < self._cached_input_expires:
+            input_coords = self._cached_input_coords
+            print(f"Using cached input box position: {input_coords}")
+        elif self.input_template_key and self.detector.templates.get(self.input_template_key):
             input_locations = self.detector._find_template(self.input_template_key, confidence=0.7)
             if input_locations:
                 input_coords = input_locations[0]
+                self._cached_input_coords = input_coords
+                self._cached_input_expires = time.monotonic() + INPUT_BOX_CACHE_TTL
                 print(f"Found input box position via image: {input_coords}")
             else:
                 print(f"Warning: Input box template '{self.input_template_key}' not found, using default coordinates.")
@@ -2185,14 +2907,16 @@ class InteractionModule:
              print("Warning: Input box template key not set or image missing, using default coordinates.")
 
         # Click input, paste, send
-        self.click_at(input_coords[0], input_coords[1])
+        if not self.click_at(input_coords[0], input_coords[1]):
+            self._cached_input_coords = None # Rescan next time instead of reusing a position that failed
         time.sleep(0.1)
 
         print("Pasting response...")
-        self.set_clipboard(reply_text)
-        time.sleep(0.1)
+        self.set_clipboard(reply_text, sanitize=True)  # Synchronous write, Ctrl+V can follow immediately
         try:
             self.hotkey('ctrl', 'v')
+            # Fixed on purpose: the game shows no signal that the paste was consumed, and the send
+            # button is visible either way, so polling it could send a partially pasted message
             time.sleep(0.4)  # Extended delay for UI to process paste operation
             print("Pasted.")
         except Exception as e:
@@ -2225,7 +2949,7 @@ class InteractionModule:
 def remove_user_position(detector: DetectionModule,
                          interactor: InteractionModule,
                          trigger_bubble_region: Tuple[int, int, int, int], # Original region, might be outdated
-                         bubble_snapshot: Any, # PIL Image object for re-location
+                         bubble_snapshot: Optional[np.ndarray], # BGR ndarray for re-location
                          search_area: Optional[Tuple[int, int, int, int]]) -> dict: # Area to search snapshot in
     """
     Performs the sequence of UI actions to remove a user's position based on the triggering chat bubble.
@@ -2258,7 +2982,7 @@ def remove_user_position(detector: DetectionModule,
                 
                 print(f"Taking new screenshot of region: {bubble_region_tuple}")
                 bubble_snapshot, extension_used = capture_extended_bubble_screenshot(bubble_region_tuple)
-                if bubble_snapshot:
+                if bubble_snapshot is not None:
                     print(f"Successfully created extended bubble snapshot with {extension_used}px left extension.")
                 else:
                     print("Failed to create new bubble snapshot.")
@@ -2294,63 +3018,39 @@ def remove_user_position(detector: DetectionModule,
     region_to_search = search_area
     print(f"Attempting bubble location. Search Region: {'Full Screen' if region_to_search is None else region_to_search}")
 
-    # First attempt with standard confidence
-    print(f"First attempt with confidence {BUBBLE_RELOCATE_CONFIDENCE}...")
+    # Capture the search area once; nothing on screen changes between the confidence levels below
+    relocation_frame = None
     try:
-        temp_bubble_box = pyautogui.locateOnScreen(bubble_snapshot,
-                                                region=region_to_search,
-                                                confidence=BUBBLE_RELOCATE_CONFIDENCE)
-        if temp_bubble_box:
-            compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
-            if compensated_coords:
-                new_bubble_box = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
-            else:
-                new_bubble_box = None
-        else:
-            print(f"DETECTION FAILED: confidence={BUBBLE_RELOCATE_CONFIDENCE}, region={region_to_search}, image_size={bubble_snapshot.size if bubble_snapshot else 'None'}")
-            new_bubble_box = None
+        relocation_frame = detector.capture_frame(region_to_search if region_to_search is not None else (0, 0, *pyautogui.size()))
     except Exception as e:
-        print(f"Exception during initial bubble location attempt: {e}")
+        print(f"Warning: Could not capture relocation frame, the match will capture its own: {e}")
 
-    # Second attempt with fallback confidence if first failed
-    if not new_bubble_box:
-        print(f"First attempt failed. Trying with lower confidence {BUBBLE_RELOCATE_FALLBACK_CONFIDENCE}...")
-        try:
-            # Try with a lower confidence threshold
-            temp_bubble_box = pyautogui.locateOnScreen(bubble_snapshot,
-                                                    region=region_to_search,
-                                                    confidence=BUBBLE_RELOCATE_FALLBACK_CONFIDENCE)
-            if temp_bubble_box:
-                compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
-                if compensated_coords:
-                    new_bubble_box = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
-                else:
-                    new_bubble_box = None
-            else:
-                print(f"FALLBACK DETECTION FAILED: confidence={BUBBLE_RELOCATE_FALLBACK_CONFIDENCE}, region={region_to_search}")
-                new_bubble_box = None
-        except Exception as e:
-            print(f"Exception during fallback bubble location attempt: {e}")
+    # Convert the snapshot to grayscale once; every confidence level below matches the same needle
+    relocation_snapshot = bubble_snapshot
+    if bubble_snapshot is not None and bubble_snapshot.ndim == 3:
+        relocation_snapshot = cv2.cvtColor(bubble_snapshot, cv2.COLOR_BGR2GRAY)
 
-    # Third attempt with even lower confidence as last resort
-    if not new_bubble_box:
-        print("Second attempt failed. Trying with even lower confidence 0.4...")
-        try:
-            # Last resort with very low confidence
-            temp_bubble_box = pyautogui.locateOnScreen(bubble_snapshot,
-                                                   region=region_to_search,
-                                                   confidence=0.4)
-            if temp_bubble_box:
-                compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
-                if compensated_coords:
-                    new_bubble_box = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
-                else:
-                    new_bubble_box = None
-            else:
-                print(f"LAST RESORT DETECTION FAILED: confidence=0.4, region={region_to_search}")
-                new_bubble_box = None
-        except Exception as e:
-            print(f"Exception during last resort bubble location attempt: {e}")
+    # The three confidence levels see the same frame and needle, so match once and
+    # walk the cascade on the single best score instead of rescanning per level
+    located = None
+    try:
+        located = detector.locate_snapshot_scored(relocation_snapshot, region_to_search, frame=relocation_frame)
+    except Exception as e:
+        print(f"Exception during bubble location attempt: {e}")
+
+    best_score = located[1] if located is not None else float('-inf')
+    for attempt_label, attempt_confidence in (("First attempt", BUBBLE_RELOCATE_CONFIDENCE),
+                                              ("Fallback attempt", BUBBLE_RELOCATE_FALLBACK_CONFIDENCE),
+                                              ("Last resort attempt", 0.4)):
+        print(f"{attempt_label} with confidence {attempt_confidence}...")
+        if best_score >= attempt_confidence:
+            temp_bubble_box = located[0]
+            compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
+            if compensated_coords:
+                new_bubble_box = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
+            break
+        print(f"{attempt_label.upper()} DETECTION FAILED: confidence={attempt_confidence}, best score={best_score:.3f}, region={region_to_search}, "
+              f"image_size={bubble_snapshot.shape[:2] if bubble_snapshot is not None else 'None'}")
 
     # If we still can't find the bubble using snapshot, try re-detecting bubbles
     if not new_bubble_box:
@@ -2615,12 +3315,25 @@ def perform_state_cleanup(detector: DetectionModule, interactor: InteractionModu
     """
     print("Performing cleanup: Attempting to press ESC to return to chat interface...")
     returned_to_chat = False
+    current_state = None
+    last_fingerprint = None # Screen hash at the time current_state was detected
     for attempt in range(max_attempts):
         print(f"Cleanup attempt #{attempt + 1}/{max_attempts}")
         time.sleep(0.1)
 
-        current_state = detector.get_current_ui_state()
-        print(f"Detected state: {current_state}")
+        try:
+            fingerprint = detector.screen_fingerprint()
+        except Exception as fp_err:
+            print(f"Warning: Could not fingerprint screen during cleanup: {fp_err}")
+            fingerprint = None
+
+        # If the previous ESC changed nothing on screen, the state cascade would return the same answer
+        if current_state is not None and fingerprint is not None and fingerprint == last_fingerprint:
+            print(f"Screen unchanged since last check, reusing state: {current_state}")
+        else:
+            current_state = detector.get_current_ui_state()
+            last_fingerprint = fingerprint
+            print(f"Detected state: {current_state}")
 
         if current_state == 'chat_room' or current_state == 'world_chat' or current_state == 'private_chat': # Adjust as needed
             print("Chat room interface detected, cleanup complete.")
@@ -2652,7 +3365,17 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
     Continuously monitors the UI, detects triggers, performs interactions,
     puts trigger data into trigger_queue, and processes commands from command_queue.
     Includes state monitoring and robust deduplication.
+    The 1ms Windows timer resolution is only held while the loop runs.
     """
+    winmm = request_timer_resolution(1)
+    try:
+        return _run_ui_monitoring_loop(trigger_queue, command_queue, deduplicator, state_monitor)
+    finally:
+        if winmm is not None:
+            winmm.timeEndPeriod(1)
+
+def _run_ui_monitoring_loop(trigger_queue: queue.Queue, command_queue: queue.Queue, deduplicator: 'RobustMessageDeduplication', state_monitor: 'StateResetDetector'):
+    """Body of run_ui_monitoring_loop_enhanced."""
     print("\n--- Starting Enhanced UI Monitoring Loop (Thread) ---")
 
     # --- 初始化氣泡圖像去重系統（新增） ---
@@ -2736,6 +3459,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
     main_screen_click_counter = 0 # Counter for consecutive main screen clicks
 
     loop_counter = 0 # Add loop counter for debugging
+    pending_command = None # Command received while waiting between cycles, processed first in the next drain
     
     while True:
         loop_counter += 1
@@ -2756,7 +3480,10 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
         commands_processed_this_cycle = False
         try:
             while True: # Loop to drain the queue
-                command_data = command_queue.get_nowait() # Check for commands without blocking
+                if pending_command is not None:
+                    command_data, pending_command = pending_command, None
+                else:
+                    command_data = command_queue.get_nowait() # Check for commands without blocking
                 commands_processed_this_cycle = True
                 action = command_data.get('action')
 
@@ -2798,7 +3525,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                     print(f"UI Thread: Processing remove_position_with_feedback (MCP: {is_mcp_request}, Request ID: {request_id})")
                     print(f"UI Thread: User context: {user_context}")
                     
-                    if snapshot:
+                    if snapshot is not None:
                         print(f"UI Thread: Snapshot available, attempting position removal...")
                         removal_result = remove_user_position(detector, interactor, original_region, snapshot, area)
                         
@@ -2884,8 +3611,8 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                     snapshot = command_data.get('bubble_snapshot')
                     area = command_data.get('search_area')
                     original_region = command_data.get('trigger_bubble_region')
-                    if snapshot: # Check for snapshot presence
-                        print(f"UI Thread: Processing legacy remove_position command (Snapshot provided: {'Yes' if snapshot else 'No'})")
+                    if snapshot is not None: # Check for snapshot presence
+                        print("UI Thread: Processing legacy remove_position command (Snapshot provided: Yes)")
                         removal_result = remove_user_position(detector, interactor, original_region, snapshot, area)
                         success = removal_result["status"] == "success"
                         
@@ -2984,8 +3711,8 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
         # print("[DEBUG] UI Loop: Checking pause state...") # DEBUG REMOVED
         if monitoring_paused_flag[0]:
             # print("[DEBUG] UI Loop: Monitoring is paused. Sleeping...") # DEBUG REMOVED
-            # If paused, sleep and skip UI monitoring part
-            time.sleep(0.1) # Sleep briefly while paused
+            # If paused, wait for the next command (e.g. resume) instead of sleeping blindly
+            pending_command = wait_for_command(command_queue, 0.1)
             continue # Go back to check commands again
 
         # --- If not paused, proceed with UI Monitoring ---
@@ -3095,7 +3822,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                 detector.no_new_bubbles_count += 1
                 if detector.no_new_bubbles_count >= detector.eco_mode_threshold:
                     detector.eco_mode_enabled = True
-                    detector.eco_mode_start_time = time.time()  # 記錄進入經濟模式的時間
+                    detector.eco_mode_start_time = time.monotonic()  # 記錄進入經濟模式的時間
                     detector.no_new_bubbles_count = 0
                     print(f"連續{detector.eco_mode_threshold}次循環無新泡泡，進入經濟模式")
                 time.sleep(2); continue
@@ -3108,7 +3835,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                 detector.no_new_bubbles_count += 1
                 if detector.no_new_bubbles_count >= detector.eco_mode_threshold:
                     detector.eco_mode_enabled = True
-                    detector.eco_mode_start_time = time.time()  # 記錄進入經濟模式的時間
+                    detector.eco_mode_start_time = time.monotonic()  # 記錄進入經濟模式的時間
                     detector.no_new_bubbles_count = 0
                     print(f"連續{detector.eco_mode_threshold}次循環無新泡泡（只有bot泡泡），進入經濟模式")
                 time.sleep(0.2); continue
@@ -3157,7 +3884,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                         screenshot_index = (screenshot_counter % MAX_DEBUG_SCREENSHOTS) + 1
                         screenshot_filename = f"debug_relocation_snapshot_{screenshot_index}.png"
                         screenshot_path = os.path.join(DEBUG_SCREENSHOT_DIR, screenshot_filename)
-                        bubble_snapshot.save(screenshot_path)
+                        save_debug_image(screenshot_path, bubble_snapshot)  # 背景寫入，快照之後只讀不改
                         screenshot_counter += 1
                     except Exception as save_err:
                         print(f"Error saving debug snapshot: {repr(save_err)}")
@@ -3234,8 +3961,8 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                             screenshot_filename = f"debug_relocation_snapshot_{screenshot_index}.png"
                             screenshot_path = os.path.join(DEBUG_SCREENSHOT_DIR, screenshot_filename)
                             print(f"Attempting to save bubble snapshot used for re-location to: {screenshot_path}")
-                            bubble_snapshot.save(screenshot_path)
-                            print(f"Successfully saved bubble snapshot: {screenshot_path}")
+                            save_debug_image(screenshot_path, bubble_snapshot)  # 背景寫入，快照之後只讀不改
+                            print(f"Queued bubble snapshot for: {screenshot_path}")
                             screenshot_counter += 1
                         except Exception as save_err:
                             print(f"Error saving bubble snapshot to {screenshot_path}: {repr(save_err)}")
@@ -3247,12 +3974,12 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                     # 4. Re-locate bubble *before* copying text
                     # print("[DEBUG] UI Loop: Re-locating bubble before copying text...") # DEBUG REMOVED
                     new_bubble_box_for_copy = None
-                    if bubble_snapshot:
+                    if bubble_snapshot is not None:
                         try:
                             # Use standard confidence for this initial critical step
-                            temp_bubble_box = pyautogui.locateOnScreen(bubble_snapshot,
-                                                                             region=search_area,
-                                                                             confidence=BUBBLE_RELOCATE_CONFIDENCE)
+                            temp_bubble_box = detector.locate_snapshot(bubble_snapshot,
+                                                                       search_area,
+                                                                       confidence=BUBBLE_RELOCATE_CONFIDENCE)
                             if temp_bubble_box:
                                 compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
                                 new_bubble_box_for_copy = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
@@ -3391,7 +4118,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                              final_bubble_box_for_reply = None
                         else:
                              print(f"Attempting final re-location for reply context using search_area: {search_area}")
-                             temp_bubble_box = pyautogui.locateOnScreen(bubble_snapshot, region=search_area, confidence=BUBBLE_RELOCATE_CONFIDENCE)
+                             temp_bubble_box = detector.locate_snapshot(bubble_snapshot, search_area, confidence=BUBBLE_RELOCATE_CONFIDENCE)
                              if temp_bubble_box:
                                  compensated_coords = compensate_coordinates_for_extended_screenshot(temp_bubble_box)
                                  final_bubble_box_for_reply = type(temp_bubble_box)(compensated_coords[0], compensated_coords[1], compensated_coords[2], compensated_coords[3])
@@ -3459,7 +4186,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                             'bubble_snapshot': bubble_snapshot,
                             'search_area': search_area
                         }
-                        trigger_queue.put(data_to_send)
+                        put_latest(trigger_queue, data_to_send)
                         found_new_bubble_this_cycle = True  # 標記找到新泡泡
                         print("Trigger info (with region, reply flag, snapshot, search_area) placed in Queue.")
                         
@@ -3481,7 +4208,7 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
                                 'bubble_snapshot': bubble_snapshot, # Keep snapshot if available
                                 'search_area': search_area
                             }
-                            trigger_queue.put(minimal_data)
+                            put_latest(trigger_queue, minimal_data)
                             found_new_bubble_this_cycle = True  # 標記找到新泡泡（即便是fallback）
                             print("Minimal fallback data placed in Queue after error.")
                         except Exception as min_q_err:
@@ -3496,14 +4223,15 @@ def run_ui_monitoring_loop_enhanced(trigger_queue: queue.Queue, command_queue: q
             # If the loop finished without breaking (i.e., no trigger processed), wait the full interval.
             # If it broke, the sleep still happens here before the next cycle.
             # print("[DEBUG] UI Loop: Finished bubble iteration or broke early. Sleeping...") # DEBUG REMOVED
-            time.sleep(1.5) # Polling interval after checking all bubbles or processing one
+            # Polling interval after checking all bubbles or processing one; a command from the main loop ends it early
+            pending_command = wait_for_command(command_queue, 1.5)
             
             # --- 經濟模式邏輯：在循環結束時檢查是否有新泡泡被處理 ---
             if not found_new_bubble_this_cycle:
                 detector.no_new_bubbles_count += 1
                 if detector.no_new_bubbles_count >= detector.eco_mode_threshold:
                     detector.eco_mode_enabled = True
-                    detector.eco_mode_start_time = time.time()  # 記錄進入經濟模式的時間
+                    detector.eco_mode_start_time = time.monotonic()  # 記錄進入經濟模式的時間
                     detector.no_new_bubbles_count = 0
                     print(f"連續{detector.eco_mode_threshold}次循環無新泡泡，進入經濟模式")
             else: